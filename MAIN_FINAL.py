@@ -1,27 +1,482 @@
+import time
+DEBUT_CHRONO = time.perf_counter() # Référence pour le mode --chrono (temps de démarrage)
 import sqlite3
-import tkinter as tk # Gardé pour les constantes (tk.END, tk.NO)
-from tkinter import ttk, messagebox
+import sys
+import argparse
 from datetime import datetime
-import customtkinter as ctk 
-# Imports pour la génération de PDF
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
 import os
+import io
+import csv
+import re
 import shutil
-from tkinter import messagebox, filedialog # Ajouter filedialog
+import gzip
+import platform
+import ipaddress
+import secrets
+import unicodedata
+import heapq
+from bisect import bisect_left
+from collections import deque
+import queue
+import random
+import tempfile
+import threading
+import multiprocessing
+import json
+import http.client
+import http.server
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Modules graphiques : chargés uniquement pour l'interface (voir importer_interface_graphique),
+# afin que le mode ligne de commande fonctionne sans affichage ni customtkinter.
+tk = ttk = messagebox = filedialog = ctk = None
+
+
+def importer_interface_graphique():
+    """Charge tkinter et customtkinter dans l'espace global du module."""
+    global tk, ttk, messagebox, filedialog, ctk
+    import tkinter as tk # Gardé pour les constantes (tk.END, tk.NO)
+    from tkinter import ttk, messagebox, filedialog
+    import customtkinter as ctk
+
+# Modules de génération de PDF : chargés au premier export seulement (voir importer_reportlab),
+# reportlab est coûteux à importer et inutile pour la caisse.
+A4 = canvas = colors = Table = TableStyle = Paragraph = getSampleStyleSheet = inch = None
+
+
+def importer_reportlab():
+    """Charge reportlab dans l'espace global du module (sans effet s'il est déjà chargé)."""
+    global A4, canvas, colors, Table, TableStyle, Paragraph, getSampleStyleSheet, inch
+    if Table is not None:
+        return
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle, Paragraph
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+
+
+
+def afficher_chrono(etiquette, debut):
+    """Mode --chrono : affiche la durée écoulée depuis debut (en ms) sur la sortie d'erreur."""
+    print(f"[chrono] {etiquette} : {(time.perf_counter() - debut) * 1000:.1f} ms", file=sys.stderr)
 
 # --- PARTIE 1 : GESTION DE LA BASE DE DONNÉES (Le Backend) ---
+ACCENTS = re.compile(r"[\u0300-\u036f]") # Diacritiques séparés par la normalisation NFKD
+MOTS = re.compile(r"\w+")
+
+
+def mots_recherche(texte):
+    """Découpe un texte en mots normalisés pour la recherche (minuscules, sans accents)."""
+    texte = unicodedata.normalize("NFKD", (texte or "").lower())
+    return MOTS.findall(ACCENTS.sub("", texte))
+
+
+class CatalogueProduits:
+    """
+    Cache mémoire des produits d'une connexion : {id: (id, nom, prix, quantite, categorie, code_barre)}
+    et index {categorie: {ids}}. Tenu à jour en place par les écritures de cette connexion ;
+    version augmente à chaque changement (l'interface ne redessine que si elle a changé).
+    La recherche par préfixe de mot utilise une liste triée (mot, id) parcourue par bisection,
+    reconstruite uniquement quand un nom ou une catégorie a changé.
+    """
+
+    def __init__(self):
+        self.produits = {}
+        self.par_categorie = {}
+        self.version = 0
+        self.charge = False
+        self.data_version = None # PRAGMA data_version lors du dernier chargement
+        # Index de recherche : mots triés et ids correspondants (listes parallèles)
+        self.index_mots = []
+        self.index_ids = []
+        self.noms_normalises = {}
+        self.version_textes = 0 # Augmente quand un nom ou une catégorie change
+        self.version_index = None
+
+    def charger(self, lignes, data_version):
+        """Remplace tout le contenu (la version n'augmente que si les produits ont changé)."""
+        produits = {ligne[0]: tuple(ligne) for ligne in lignes}
+        self.charge = True
+        self.data_version = data_version
+        if produits == self.produits:
+            return
+        # Après une vente sur une autre connexion seuls les stocks changent : l'index de recherche reste valable
+        if len(produits) != len(self.produits) or any(
+                (p[1], p[4]) != self.produits.get(pid, (None,) * 6)[1::3] for pid, p in produits.items()):
+            self.version_textes += 1
+        self.produits = produits
+        self.par_categorie = {}
+        for produit in produits.values():
+            self.par_categorie.setdefault(produit[4], set()).add(produit[0])
+        self.version += 1
+
+    def invalider(self):
+        """Force un rechargement complet au prochain accès (ex. après une restauration)."""
+        self.charge = False
+
+    def mettre_a_jour(self, produit):
+        """Ajoute ou remplace un produit (id, nom, prix, quantite, categorie, code_barre)."""
+        if not self.charge:
+            return # Rien en mémoire : le prochain chargement lira la base
+        produit = tuple(produit)
+        ancien = self.produits.get(produit[0])
+        if ancien == produit:
+            return
+        if ancien:
+            self.retirer_de_categorie(ancien)
+        if ancien is None or ancien[1] != produit[1] or ancien[4] != produit[4]:
+            self.version_textes += 1 # Une simple variation de stock ne touche pas l'index de recherche
+        self.produits[produit[0]] = produit
+        self.par_categorie.setdefault(produit[4], set()).add(produit[0])
+        self.version += 1
+
+    def ajuster_quantite(self, produit_id, delta):
+        produit = self.produits.get(produit_id)
+        if produit:
+            self.mettre_a_jour(produit[:3] + (produit[3] + delta,) + produit[4:])
+
+    def retirer(self, produit_id):
+        if not self.charge:
+            return
+        ancien = self.produits.pop(produit_id, None)
+        if ancien:
+            self.retirer_de_categorie(ancien)
+            self.version += 1
+            self.version_textes += 1
+
+    def retirer_de_categorie(self, produit):
+        ids = self.par_categorie.get(produit[4])
+        if ids is not None:
+            ids.discard(produit[0])
+            if not ids:
+                del self.par_categorie[produit[4]]
+
+    def liste(self, categorie=None):
+        """Produits triés par id, éventuellement limités à une catégorie (via l'index)."""
+        if categorie is None:
+            return sorted(self.produits.values())
+        return [self.produits[pid] for pid in sorted(self.par_categorie.get(categorie, ()))]
+
+    def categories(self):
+        return sorted(c for c in self.par_categorie if c)
+
+    def construire_index(self):
+        entrees = []
+        self.noms_normalises = {}
+        for prod_id, nom, prix, quantite, categorie, code_barre in self.produits.values():
+            mots_nom = mots_recherche(nom)
+            self.noms_normalises[prod_id] = " ".join(mots_nom)
+            for mot in set(mots_nom + mots_recherche(categorie)):
+                entrees.append((mot, prod_id))
+        entrees.sort()
+        self.index_mots = [mot for mot, _ in entrees]
+        self.index_ids = [prod_id for _, prod_id in entrees]
+        self.version_index = self.version_textes
+
+    def rechercher(self, texte, categorie=None, limite=20):
+        """
+        Produits dont chaque mot du texte est le début d'un mot du nom ou de la catégorie
+        (ex. "sav ma" trouve "Savon de Marseille"). Les noms commençant par le texte
+        sont classés en premier, puis par ordre alphabétique. Texte vide : premiers produits.
+        """
+        mots = mots_recherche(texte)
+        if not mots:
+            return self.liste(categorie)[:limite]
+        if self.version_index != self.version_textes:
+            self.construire_index()
+
+        candidats = None
+        for mot in mots:
+            debut = bisect_left(self.index_mots, mot)
+            fin = bisect_left(self.index_mots, mot + "\uffff", debut)
+            ids = set(self.index_ids[debut:fin])
+            candidats = ids if candidats is None else candidats & ids
+            if not candidats:
+                return []
+        if categorie is not None:
+            candidats &= self.par_categorie.get(categorie, set())
+
+        requete = " ".join(mots)
+        meilleurs = heapq.nsmallest(limite, candidats, key=lambda pid: (
+            not self.noms_normalises[pid].startswith(requete), self.noms_normalises[pid], pid))
+        return [self.produits[pid] for pid in meilleurs]
+
+
+def centile(valeurs_triees, pourcentage):
+    """Centile (rang le plus proche) d'une liste déjà triée ; 0 si elle est vide."""
+    if not valeurs_triees:
+        return 0.0
+    rang = max(1, -(-len(valeurs_triees) * pourcentage // 100)) # Arrondi supérieur
+    return valeurs_triees[int(rang) - 1]
+
+
+# Instrumentation des requêtes (option --instrumenter) : sans elle, les connexions sont des
+# objets sqlite3 ordinaires et rien n'est mesuré.
+STATISTIQUES_REQUETES = None
+
+
+def activer_instrumentation(seuil_lent_ms=100):
+    """Chronomètre les requêtes de toutes les connexions ouvertes ensuite, dans tous les threads."""
+    global STATISTIQUES_REQUETES
+    STATISTIQUES_REQUETES = StatistiquesRequetes(seuil_lent_ms)
+    return STATISTIQUES_REQUETES
+
+
+class StatistiquesRequetes:
+    """
+    Durées des requêtes SQL et des commits par méthode appelante, partagées par tous les threads
+    (protégées par un verrou) : cumul depuis l'activation (appels, total, max) et fenêtre glissante
+    des dernières durées (centile 95 et histogramme). Les requêtes plus longues que seuil_lent_ms
+    sont gardées, et affichées sur la sortie d'erreur, avec leur EXPLAIN QUERY PLAN.
+    """
+    BORNES_HISTOGRAMME = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000) # ms ; une case de plus au-delà
+    TAILLE_FENETRE = 1000 # Dernières durées gardées par méthode
+    NB_REQUETES_LENTES = 50
+
+    def __init__(self, seuil_lent_ms=100):
+        self.seuil_lent_ms = seuil_lent_ms
+        self.verrou = threading.Lock()
+        # Code des méthodes de la couche base de données : l'appel est attribué à la plus externe
+        self.codes_gestion = {fonction.__code__ for fonction in vars(GestionBaseDeDonnees).values()
+                              if hasattr(fonction, "__code__")}
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        with self.verrou:
+            self.par_methode = {} # {methode: [appels, total_ms, max_ms, deque des dernières durées]}
+            self.requetes_lentes = deque(maxlen=self.NB_REQUETES_LENTES)
+
+    def methode_appelante(self, cadre):
+        """
+        Méthode de GestionBaseDeDonnees la plus externe de la pile (faire_vente_panier plutôt que
+        transaction_vente_panier ou debut_transaction_ecriture), sinon la fonction appelante.
+        """
+        methode = cadre.f_code.co_name
+        while cadre is not None and cadre.f_code in self.codes_gestion:
+            methode = cadre.f_code.co_name
+            cadre = cadre.f_back
+        return methode
+
+    def mesurer(self, cadre, debut, sql, params=(), conn=None):
+        """Enregistre une requête commencée à debut (perf_counter), appelée depuis cadre."""
+        methode = self.methode_appelante(cadre)
+        if sql == "COMMIT":
+            methode += " (commit)"
+        self.enregistrer(methode, (time.perf_counter() - debut) * 1000, sql, params, conn)
+
+    def enregistrer(self, methode, duree_ms, sql, params=(), conn=None):
+        """Enregistre une requête de duree_ms attribuée à methode (plan calculé sur conn si elle est lente)."""
+        with self.verrou:
+            stats = self.par_methode.get(methode)
+            if stats is None:
+                stats = self.par_methode[methode] = [0, 0.0, 0.0, deque(maxlen=self.TAILLE_FENETRE)]
+            stats[0] += 1
+            stats[1] += duree_ms
+            stats[2] = max(stats[2], duree_ms)
+            stats[3].append(duree_ms)
+        if duree_ms >= self.seuil_lent_ms:
+            # Plan calculé sur le texte d'origine : sur une seule ligne, un commentaire -- masquerait la suite
+            plan = self.plan_execution(conn, sql, params) if conn is not None else ""
+            sql = " ".join(sql.split())
+            with self.verrou:
+                self.requetes_lentes.append((datetime.now().strftime("%H:%M:%S"), methode, duree_ms, sql, plan))
+            print(f"[requête lente] {duree_ms:.1f} ms dans {methode} : {sql}\n  plan : {plan}", file=sys.stderr)
+
+    def plan_execution(self, conn, sql, params):
+        if sql.split(None, 1)[0].upper() not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE"):
+            return "" # PRAGMA, BEGIN... : pas de plan
+        try:
+            return " | ".join(ligne[3] for ligne in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        except sqlite3.Error as e:
+            return f"(plan indisponible : {e})"
+
+    def instantane(self):
+        """
+        ([(methode, appels, total_ms, moyenne_ms, p95_ms, max_ms, histogramme)], requetes_lentes),
+        méthodes triées par temps total décroissant ; centile et histogramme sur la fenêtre glissante.
+        """
+        with self.verrou:
+            copies = [(methode, appels, total, maximum, sorted(fenetre))
+                      for methode, (appels, total, maximum, fenetre) in self.par_methode.items()]
+            lentes = list(self.requetes_lentes)
+        lignes = []
+        for methode, appels, total, maximum, durees in copies:
+            histogramme = [0] * (len(self.BORNES_HISTOGRAMME) + 1)
+            for duree in durees:
+                histogramme[bisect_left(self.BORNES_HISTOGRAMME, duree)] += 1
+            lignes.append((methode, appels, total, total / appels, centile(durees, 95), maximum, histogramme))
+        lignes.sort(key=lambda ligne: ligne[2], reverse=True)
+        return lignes, lentes
+
+
+class CurseurInstrumente:
+    """
+    Curseur sqlite3 chronométré (voir StatistiquesRequetes). Pour un SELECT, SQLite fait l'essentiel
+    du travail pendant la lecture des lignes : le temps de fetchone, fetchmany, fetchall et de
+    l'itération est ajouté à celui de execute, et la requête est enregistrée (avec la méthode qui l'a
+    exécutée) quand toutes ses lignes ont été lues, ou au plus tard à la requête suivante du curseur.
+    """
+
+    def __init__(self, curseur, stats):
+        self.curseur = curseur
+        self.stats = stats
+        self.requete = None # [methode, duree_ms, sql, params] de la requête en cours de lecture
+
+    def __getattr__(self, nom):
+        return getattr(self.curseur, nom) # rowcount, lastrowid, description...
+
+    def commencer(self, cadre, sql, params):
+        self.terminer() # Lignes non lues de la requête précédente : elle s'arrête là
+        self.requete = [self.stats.methode_appelante(cadre), 0.0, sql, params]
+
+    def ajouter(self, debut, fini):
+        if self.requete is None:
+            return
+        self.requete[1] += (time.perf_counter() - debut) * 1000
+        if fini:
+            self.terminer()
+
+    def terminer(self):
+        if self.requete is not None:
+            methode, duree_ms, sql, params = self.requete
+            self.requete = None
+            self.stats.enregistrer(methode, duree_ms, sql, params, self.curseur.connection)
+
+    def execute(self, sql, params=()):
+        self.commencer(sys._getframe(1), sql, params)
+        debut = time.perf_counter()
+        fini = True
+        try:
+            self.curseur.execute(sql, params)
+            fini = self.curseur.description is None # Pas de lignes à lire (INSERT, UPDATE...)
+            return self
+        finally:
+            self.ajouter(debut, fini)
+
+    def executemany(self, sql, lignes):
+        # Plan d'exécution d'une requête lente calculé avec la première ligne de paramètres
+        params = lignes[0] if isinstance(lignes, (list, tuple)) and lignes else ()
+        self.commencer(sys._getframe(1), sql, params)
+        debut = time.perf_counter()
+        try:
+            self.curseur.executemany(sql, lignes)
+            return self
+        finally:
+            self.ajouter(debut, True)
+
+    def fetchone(self):
+        debut = time.perf_counter()
+        ligne = None
+        try:
+            ligne = self.curseur.fetchone()
+            return ligne
+        finally:
+            self.ajouter(debut, ligne is None)
+
+    def fetchmany(self, taille=None):
+        taille = self.curseur.arraysize if taille is None else taille
+        debut = time.perf_counter()
+        lignes = []
+        try:
+            lignes = self.curseur.fetchmany(taille)
+            return lignes
+        finally:
+            self.ajouter(debut, len(lignes) < taille)
+
+    def fetchall(self):
+        debut = time.perf_counter()
+        try:
+            return self.curseur.fetchall()
+        finally:
+            self.ajouter(debut, True)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        ligne = self.fetchone()
+        if ligne is None:
+            raise StopIteration
+        return ligne
+
+
+class ConnexionInstrumentee:
+    """Connexion sqlite3 dont les commits et les curseurs sont chronométrés."""
+
+    def __init__(self, conn, stats):
+        self.conn = conn
+        self.stats = stats
+
+    def __getattr__(self, nom):
+        return getattr(self.conn, nom) # rollback, close, backup...
+
+    def cursor(self):
+        return CurseurInstrumente(self.conn.cursor(), self.stats)
+
+    def commit(self):
+        debut = time.perf_counter()
+        try:
+            self.conn.commit()
+        finally:
+            self.stats.mesurer(sys._getframe(1), debut, "COMMIT")
+
+
 class GestionBaseDeDonnees:
-    def __init__(self, db_name="mon_magasin.db"):
+    # Profils de connexion (PRAGMA appliqués à chaque ouverture de la base)
+    # - "rapide"  : WAL + synchronous=NORMAL, un commit ne force plus de fsync du journal.
+    #               Aucune corruption possible ; seule la dernière transaction peut être
+    #               perdue en cas de coupure de courant.
+    # - "durable" : WAL + synchronous=FULL, chaque commit est écrit sur disque.
+    PROFILS_CONNEXION = {
+        "rapide": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -64000,       # ~64 Mo (valeur négative = en Kio)
+            "mmap_size": 268435456,     # 256 Mo
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,       # ms d'attente si la base est verrouillée
+        },
+        "durable": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "cache_size": -16000,
+            "mmap_size": 0,
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+        },
+    }
+
+    REESSAIS_VERROU = 5 # Nouvelles tentatives d'une écriture si la base reste verrouillée au-delà de busy_timeout
+    SEUIL_ATTENTE_VERROU = 0.01 # s : au-delà, l'ouverture d'une transaction compte comme une attente de verrou
+
+    def __init__(self, db_name="mon_magasin.db", profil="rapide", caisse_id=None):
+        if profil not in self.PROFILS_CONNEXION:
+            raise ValueError(f"Profil de connexion inconnu : {profil}")
         self.db_name = db_name
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
+        self.profil = profil
+        # Identifiant de la caisse enregistré sur chaque vente (par défaut : nom du poste)
+        self.caisse_id = caisse_id or platform.node() or "principale"
+        # Compteurs de contention entre caisses (affichés par les commandes stress / charge)
+        self.nb_attentes_verrou = 0
+        self.temps_attente_verrou = 0.0
+        self.nb_reessais_verrou = 0
+        self.catalogue = CatalogueProduits() # Chargé au premier accès (voir recuperer_catalogue)
+        self.ouvrir_connexion()
         self.creer_tables()
-        self.initialiser_utilisateurs() 
+        self.appliquer_migrations()
+        self.initialiser_utilisateurs()
+
+    def ouvrir_connexion(self):
+        """Ouvre la connexion SQLite et applique les PRAGMA du profil choisi."""
+        self.conn = sqlite3.connect(self.db_name)
+        if STATISTIQUES_REQUETES is not None:
+            self.conn = ConnexionInstrumentee(self.conn, STATISTIQUES_REQUETES)
+        self.cursor = self.conn.cursor()
+        for pragma, valeur in self.PROFILS_CONNEXION[self.profil].items():
+            self.cursor.execute(f"PRAGMA {pragma} = {valeur}")
+            self.cursor.fetchall() # Certains PRAGMA (journal_mode) renvoient une ligne
 
     def creer_tables(self):
         # Table des produits (Stock)
@@ -73,6 +528,141 @@ class GestionBaseDeDonnees:
         """)
         self.conn.commit()
 
+    # Recalcul complet du résumé journalier à partir de la table ventes
+    REQUETE_RECONSTRUCTION_RESUME = """
+        INSERT INTO ventes_journalieres (jour, produit_id, categorie, quantite, chiffre_affaires)
+        SELECT substr(v.date_vente, 1, 10), v.produit_id, COALESCE(p.categorie, 'Général'),
+               SUM(v.quantite), SUM(v.quantite * v.prix_unitaire)
+        FROM ventes v
+        LEFT JOIN produits p ON p.id = v.produit_id
+        GROUP BY substr(v.date_vente, 1, 10), v.produit_id
+    """
+
+    # Migrations du schéma : (version, [requêtes SQL]).
+    # PRAGMA user_version mémorise la dernière version appliquée à la base.
+    # Ne jamais modifier une migration déjà livrée : ajouter une nouvelle version à la fin.
+    MIGRATIONS = [
+        (1, [
+            # Index pour les filtres/tris de l'historique et du journal de stock
+            "CREATE INDEX IF NOT EXISTS idx_ventes_date ON ventes(date_vente)",
+            "CREATE INDEX IF NOT EXISTS idx_ventes_produit_date ON ventes(produit_id, date_vente)",
+            "CREATE INDEX IF NOT EXISTS idx_journal_stock_date ON journal_stock(date_entree)",
+            "CREATE INDEX IF NOT EXISTS idx_produits_categorie ON produits(categorie)",
+        ]),
+        (2, [
+            # Prix unitaire (CDF) et nom du produit figés au moment de la vente
+            "ALTER TABLE ventes ADD COLUMN prix_unitaire REAL",
+            "ALTER TABLE ventes ADD COLUMN nom_produit TEXT",
+            # Reprise des ventes existantes avec les valeurs actuelles des produits
+            """UPDATE ventes SET
+                   prix_unitaire = COALESCE((SELECT p.prix FROM produits p WHERE p.id = ventes.produit_id), 0),
+                   nom_produit = COALESCE((SELECT p.nom FROM produits p WHERE p.id = ventes.produit_id),
+                                          'Produit supprimé #' || produit_id)
+               WHERE prix_unitaire IS NULL""",
+        ]),
+        (3, [
+            # Résumé des ventes par jour et par produit, tenu à jour à chaque vente
+            """CREATE TABLE IF NOT EXISTS ventes_journalieres (
+                   jour TEXT NOT NULL,                 -- YYYY-MM-DD
+                   produit_id INTEGER NOT NULL,
+                   categorie TEXT,                     -- Catégorie du produit (actuelle lors d'une reconstruction)
+                   quantite INTEGER NOT NULL DEFAULT 0,
+                   chiffre_affaires REAL NOT NULL DEFAULT 0, -- En CDF
+                   PRIMARY KEY (jour, produit_id)
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_ventes_journalieres_categorie ON ventes_journalieres(categorie, jour)",
+            "DELETE FROM ventes_journalieres",
+            REQUETE_RECONSTRUCTION_RESUME,
+        ]),
+        (4, [
+            # Code-barres / SKU lu par les scanners de caisse (NULL autorisé pour plusieurs produits)
+            "ALTER TABLE produits ADD COLUMN code_barre TEXT",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_produits_code_barre ON produits(code_barre)",
+        ]),
+        (5, [
+            # Caisse ayant enregistré la vente (plusieurs postes sur la même base)
+            "ALTER TABLE ventes ADD COLUMN caisse_id TEXT",
+            "CREATE INDEX IF NOT EXISTS idx_ventes_caisse_date ON ventes(caisse_id, date_vente)",
+        ]),
+    ]
+
+    def appliquer_migrations(self):
+        """Met à niveau le schéma de la base (en place) jusqu'à la dernière version connue."""
+        self.cursor.execute("PRAGMA user_version")
+        version_actuelle = self.cursor.fetchone()[0]
+
+        for version, requetes in self.MIGRATIONS:
+            if version <= version_actuelle:
+                continue
+            # Chaque migration est appliquée dans sa propre transaction (tout ou rien)
+            try:
+                self.debut_transaction_ecriture()
+                # Relecture sous verrou : un autre processus a pu appliquer la migration entre-temps
+                self.cursor.execute("PRAGMA user_version")
+                if self.cursor.fetchone()[0] >= version:
+                    self.conn.commit()
+                    continue
+                for requete in requetes:
+                    self.cursor.execute(requete)
+                self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            version_actuelle = version
+
+    def debut_transaction_ecriture(self):
+        """
+        Ouvre une transaction d'écriture avec BEGIN IMMEDIATE : le verrou d'écriture est pris
+        dès le début (en attendant au plus busy_timeout si une autre caisse écrit). Ainsi aucune
+        transaction ne commence par lire pour découvrir ensuite qu'elle ne peut plus écrire.
+        """
+        debut = time.perf_counter()
+        self.cursor.execute("BEGIN IMMEDIATE")
+        attente = time.perf_counter() - debut
+        if attente > self.SEUIL_ATTENTE_VERROU:
+            self.nb_attentes_verrou += 1
+            self.temps_attente_verrou += attente
+
+    def reessayer_si_verrouille(self, operation, *args):
+        """
+        Exécute operation(*args) (une transaction complète). Si la base est restée verrouillée par
+        une autre caisse au-delà de busy_timeout, réessaie après une attente croissante avec un peu
+        d'aléa, pour que les caisses en conflit ne se représentent pas en même temps.
+        """
+        for tentative in range(self.REESSAIS_VERROU + 1):
+            try:
+                return operation(*args)
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or tentative == self.REESSAIS_VERROU:
+                    raise
+                self.nb_reessais_verrou += 1
+                time.sleep(0.05 * 2 ** tentative * (1 + random.random()))
+
+    def ecrire(self, *requetes):
+        """
+        Exécute les requêtes (requete, params) en une transaction BEGIN IMMEDIATE, réessayée si la base
+        reste verrouillée, comme les ventes et les réceptions. Retourne le curseur (rowcount et lastrowid
+        de la dernière requête). Une erreur (IntegrityError...) annule toute la transaction et est levée.
+        """
+        return self.reessayer_si_verrouille(self.transaction_ecriture, requetes)
+
+    def transaction_ecriture(self, requetes):
+        try:
+            self.debut_transaction_ecriture()
+            for requete, params in requetes:
+                self.cursor.execute(requete, params)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        return self.cursor
+
+    def version_donnees(self):
+        """PRAGMA data_version : change quand une AUTRE connexion (autre caisse, autre thread) a validé une écriture."""
+        self.cursor.execute("PRAGMA data_version")
+        return self.cursor.fetchone()[0]
+
     def initialiser_utilisateurs(self):
         # Utilisateurs de test : Gérant et Vendeur
         self.ajouter_utilisateur_initial("gérant", "admin123", "Gérant")
@@ -81,17 +671,13 @@ class GestionBaseDeDonnees:
         
     def ajouter_configuration_initiale(self, cle, valeur):
         try:
-            self.cursor.execute("INSERT INTO configuration (cle, valeur) VALUES (?, ?)", 
-                            (cle, valeur))
-            self.conn.commit()
+            self.ecrire(("INSERT INTO configuration (cle, valeur) VALUES (?, ?)", (cle, valeur)))
         except sqlite3.IntegrityError:
             pass # La clé de configuration existe déjà
 
     def ajouter_utilisateur_initial(self, username, password, role):
         try:
-            self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", 
-                                (username, password, role))
-            self.conn.commit()
+            self.ecrire(("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password, role)))
         except sqlite3.IntegrityError:
             pass # L'utilisateur existe déjà
 
@@ -102,38 +688,82 @@ class GestionBaseDeDonnees:
             return resultat # Retourne (id, role)
         return None
 
-    def ajouter_produit(self, nom, prix, quantite, categorie="Général"): # MODIF: Ajout de categorie
-        self.cursor.execute("INSERT INTO produits (nom, prix, quantite, categorie) VALUES (?, ?, ?, ?)", 
-                            (nom, prix, quantite, categorie)) # MODIF: Ajout de categorie
-        self.conn.commit()
+    def ajouter_produit(self, nom, prix, quantite, categorie="Général", code_barre=None): # MODIF: Ajout de categorie
+        code_barre = (code_barre or "").strip() or None # Code vide = pas de code-barres
+        try:
+            curseur = self.ecrire(("INSERT INTO produits (nom, prix, quantite, categorie, code_barre) VALUES (?, ?, ?, ?, ?)",
+                                   (nom, prix, quantite, categorie, code_barre))) # MODIF: Ajout de categorie
+        except sqlite3.IntegrityError:
+            return False, f"Le code-barres {code_barre} est déjà attribué à un autre produit."
+        self.catalogue.mettre_a_jour((curseur.lastrowid, nom, prix, quantite, categorie, code_barre))
+        return True, "Produit ajouté !"
 
     def enregistrer_entree_stock(self, produit_id, quantite_ajoutee):
-        """Ajoute une quantité au stock et enregistre le mouvement."""
+        """Ajoute une quantité au stock et enregistre le mouvement (réception d'une seule ligne)."""
         if quantite_ajoutee <= 0:
             return False, "La quantité ajoutée doit être positive."
-            
-        self.cursor.execute("SELECT quantite FROM produits WHERE id = ?", (produit_id,))
-        resultat = self.cursor.fetchone()
-        
-        if not resultat:
-            return False, "Produit introuvable."
-            
-        stock_actuel = resultat[0]
-        nouveau_stock = stock_actuel + quantite_ajoutee
-        
-        # 1. Mise à jour du stock total dans la table produits
-        self.cursor.execute("UPDATE produits SET quantite = ? WHERE id = ?", (nouveau_stock, produit_id))
-        
-        # 2. Enregistrement dans le journal de stock
+        success, message = self.enregistrer_reception([(produit_id, quantite_ajoutee)])
+        return success, ("Entrée de stock enregistrée." if success else message)
+
+    def enregistrer_reception(self, lignes):
+        """
+        Enregistre une réception de marchandises [(produit_id, quantite_ajoutee), ...] en UNE transaction :
+        incréments par UPDATE ... SET quantite = quantite + ? (sans lecture préalable du stock)
+        et écriture du journal en un seul lot. Les lignes d'un même produit sont cumulées.
+        Si un produit est introuvable, rien n'est enregistré. Retourne (succes, message).
+        """
+        quantites = {}
+        for produit_id, quantite_ajoutee in lignes:
+            if quantite_ajoutee <= 0:
+                return False, f"Quantité invalide pour le produit ID {produit_id}."
+            quantites[produit_id] = quantites.get(produit_id, 0) + quantite_ajoutee
+        if not quantites:
+            return False, "La réception ne contient aucune ligne."
+        return self.reessayer_si_verrouille(self.transaction_reception, quantites)
+
+    def transaction_reception(self, quantites):
         date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.cursor.execute("INSERT INTO journal_stock (produit_id, quantite_ajoutee, date_entree) VALUES (?, ?, ?)", 
-                            (produit_id, quantite_ajoutee, date))
-                            
-        self.conn.commit()
-        return True, "Entrée de stock enregistrée."
+        try:
+            self.debut_transaction_ecriture()
+            # 1. Mise à jour du stock total dans la table produits
+            self.cursor.executemany("UPDATE produits SET quantite = quantite + ? WHERE id = ?",
+                                    [(quantite, produit_id) for produit_id, quantite in quantites.items()])
+            if self.cursor.rowcount != len(quantites):
+                # Au moins un produit n'existe plus : annulation de toute la réception
+                self.conn.rollback()
+                introuvables = []
+                for produit_id in quantites:
+                    self.cursor.execute("SELECT 1 FROM produits WHERE id = ?", (produit_id,))
+                    if not self.cursor.fetchone():
+                        introuvables.append(str(produit_id))
+                return False, f"Produit introuvable (ID {', '.join(introuvables)}). Aucune entrée enregistrée."
+
+            # 2. Enregistrement dans le journal de stock (un lot)
+            self.cursor.executemany("INSERT INTO journal_stock (produit_id, quantite_ajoutee, date_entree) VALUES (?, ?, ?)",
+                                    [(produit_id, quantite, date) for produit_id, quantite in quantites.items()])
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        for produit_id, quantite in quantites.items():
+            self.catalogue.ajuster_quantite(produit_id, quantite)
+        return True, f"Réception enregistrée : {len(quantites)} article(s), {sum(quantites.values())} unité(s)."
 
     def recuperer_journal_stock(self, date_debut=None, date_fin=None): # MODIF: Ajout de filtres
         """Récupère tous les mouvements d'entrée de stock, avec filtres optionnels."""
+        query, params = self.requete_journal_stock(date_debut, date_fin)
+        self.cursor.execute(query, params) # MODIF: Passage des paramètres
+        # Résultat: (date_entree, nom_produit, quantite_ajoutee)
+        return self.cursor.fetchall()
+
+    def iterer_journal_stock(self, date_debut=None, date_fin=None, taille_lot=500):
+        """Parcourt le journal de stock par lots de lignes (mémoire constante, pour les rapports)."""
+        query, params = self.requete_journal_stock(date_debut, date_fin)
+        return self.iterer_par_lots(query, params, taille_lot)
+
+    def requete_journal_stock(self, date_debut=None, date_fin=None):
+        """Requête SQL (et paramètres) du journal de stock filtré par dates."""
         query = """
             SELECT
                 j.date_entree,
@@ -142,121 +772,346 @@ class GestionBaseDeDonnees:
             FROM journal_stock j
             JOIN produits p ON j.produit_id = p.id
         """
-        params = []
-        conditions = []
-        
-        # Construction dynamique des filtres de dates
-        if date_debut:
-            conditions.append("j.date_entree >= ?")
-            params.append(date_debut + " 00:00:00")
-        if date_fin:
-            conditions.append("j.date_entree <= ?")
-            params.append(date_fin + " 23:59:59")
-        
+        conditions, params = self.filtre_dates("j.date_entree", date_debut, date_fin)
         if conditions:
             query += " WHERE " + " AND ".join(conditions) # AJOUT
             
         query += " ORDER BY j.date_entree DESC"
-        
-        self.cursor.execute(query, params) # MODIF: Passage des paramètres
-        # Résultat: (date_entree, nom_produit, quantite_ajoutee)
+        return query, params
+
+    def recuperer_journal_stock_page(self, date_debut=None, date_fin=None, apres=None, limite=500):
+        """
+        Récupère une page du journal de stock (du plus récent au plus ancien), avec la même
+        pagination par clé que recuperer_ventes_page, sur (date_entree, id).
+        """
+        query = """
+            SELECT
+                j.id,
+                j.date_entree,
+                p.nom,
+                j.quantite_ajoutee
+            FROM journal_stock j
+            JOIN produits p ON j.produit_id = p.id
+        """
+        conditions, params = self.filtre_dates("j.date_entree", date_debut, date_fin)
+        if apres:
+            conditions.append("(j.date_entree, j.id) < (?, ?)")
+            params.extend(apres)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        query += " ORDER BY j.date_entree DESC, j.id DESC LIMIT ?"
+        params.append(limite)
+
+        self.cursor.execute(query, params)
+        # Résultat: (id_entree, date_entree, nom_produit, quantite_ajoutee)
         return self.cursor.fetchall()
 
+    def calculer_total_journal_stock(self, date_debut=None, date_fin=None):
+        """Nombre d'entrées et total des quantités ajoutées sur la période (agrégat SQL)."""
+        query = """
+            SELECT COUNT(*), COALESCE(SUM(j.quantite_ajoutee), 0)
+            FROM journal_stock j
+            JOIN produits p ON j.produit_id = p.id
+        """
+        conditions, params = self.filtre_dates("j.date_entree", date_debut, date_fin)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        self.cursor.execute(query, params)
+        return self.cursor.fetchone()
+
+    def iterer_par_lots(self, query, params, taille_lot=500):
+        """Exécute query sur un curseur dédié et produit les lignes par lots de taille_lot."""
+        curseur = self.conn.cursor()
+        try:
+            curseur.execute(query, params)
+            while True:
+                lignes = curseur.fetchmany(taille_lot)
+                if not lignes:
+                    break
+                yield lignes
+        finally:
+            curseur.close()
+
     def recuperer_categories(self):
-        """Récupère la liste de toutes les catégories uniques."""
-        # AJOUT
-        self.cursor.execute("SELECT DISTINCT categorie FROM produits WHERE categorie IS NOT NULL AND categorie != '' ORDER BY categorie ASC")
-        # Le résultat est une liste de tuples (categorie,). On extrait la chaîne.
-        return [row[0] for row in self.cursor.fetchall()]
+        """Récupère la liste de toutes les catégories uniques (index du catalogue, sans requête)."""
+        return self.recuperer_catalogue().categories()
 
     def recuperer_produits(self, categorie_filtre=None): # MODIF: Ajout de categorie_filtre
         """Récupère la liste des produits, optionnellement filtrée par catégorie."""
-        query = "SELECT * FROM produits"
-        params = []
-        
-        # Le filtre est géré entièrement au niveau du frontend maintenant
-        # car on a besoin de tous les produits pour l'affichage gérant et les détails
-        # du panier, mais on garde la signature pour l'éventuelle évolution future.
-        self.cursor.execute(query, params)
-        # Résultat: (id, nom, prix, quantite, categorie)
-        return self.cursor.fetchall()
+        # Résultat: (id, nom, prix, quantite, categorie, code_barre)
+        return self.recuperer_catalogue().liste(categorie_filtre)
+
+    def trouver_par_code(self, code):
+        """Produit portant ce code-barres, ou None (recherche par l'index unique idx_produits_code_barre)."""
+        code = (code or "").strip()
+        if not code:
+            return None
+        self.cursor.execute("SELECT id, nom, prix, quantite, categorie, code_barre FROM produits WHERE code_barre = ?", (code,))
+        return self.cursor.fetchone()
+
+    def rechercher_produits(self, texte, categorie_filtre=None, limite=20):
+        """Recherche par début de mot dans les noms et catégories (index en mémoire du catalogue)."""
+        # Résultat: [(id, nom, prix, quantite, categorie, code_barre), ...] classés par pertinence
+        return self.recuperer_catalogue().rechercher(texte, categorie_filtre, limite)
+
+    def recuperer_catalogue(self):
+        """
+        Retourne le catalogue des produits en mémoire. Il n'est relu dans la base qu'au premier
+        accès ou si une autre connexion a modifié la base depuis (PRAGMA data_version).
+        """
+        self.cursor.execute("PRAGMA data_version")
+        data_version = self.cursor.fetchone()[0]
+        if not self.catalogue.charge or data_version != self.catalogue.data_version:
+            self.cursor.execute("SELECT id, nom, prix, quantite, categorie, code_barre FROM produits ORDER BY id")
+            self.catalogue.charger(self.cursor.fetchall(), data_version)
+        return self.catalogue
 
     def faire_une_vente(self, produit_id, quantite_demandee):
         """
-        Effectue une vente pour un seul produit. 
-        Cette méthode sera appelée en boucle pour chaque article du panier.
+        Effectue une vente pour un seul produit.
+        Raccourci vers faire_vente_panier pour un panier d'une seule ligne.
         """
-        # Logique de transaction (vérification et soustraction du stock)
-        self.cursor.execute("SELECT quantite FROM produits WHERE id = ?", (produit_id,))
-        resultat = self.cursor.fetchone()
-        
-        if resultat:
-            stock_actuel = resultat[0]
-            if stock_actuel >= quantite_demandee:
-                # Soustraction du stock
-                nouveau_stock = stock_actuel - quantite_demandee
-                self.cursor.execute("UPDATE produits SET quantite = ? WHERE id = ?", (nouveau_stock, produit_id))
-                
-                # Enregistrement de la vente
-                date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.cursor.execute("INSERT INTO ventes (produit_id, quantite, date_vente) VALUES (?, ?, ?)", 
-                                    (produit_id, quantite_demandee, date))
-                
-                # Commit de la transaction (IMPORTANT)
-                self.conn.commit() 
-                return True, "Vente réussie !"
-            else:
-                return False, "Erreur : Stock insuffisant."
-        return False, "Erreur : Produit introuvable."
-        
+        succes, resultats = self.faire_vente_panier({produit_id: quantite_demandee})
+        return succes, resultats[0][3]
+
+    def faire_vente_panier(self, panier, caisse_id=None):
+        """
+        Effectue la vente de tout le panier {produit_id: quantite} en UNE seule transaction.
+        Chaque ligne est décrémentée par un UPDATE conditionnel (stock suffisant) ;
+        si une seule ligne échoue, toute la vente est annulée (pas de vente partielle).
+        Le panier peut aussi être une liste de paires [(produit_id, quantite), ...] (appels du serveur),
+        et caisse_id remplace celui de la connexion (vente faite par une caisse cliente du serveur).
+        Retourne (succes, resultats) avec resultats = [(produit_id, quantite, succes, message), ...]
+        """
+        return self.reessayer_si_verrouille(self.transaction_vente_panier, dict(panier), caisse_id or self.caisse_id)
+
+    def transaction_vente_panier(self, panier, caisse_id):
+        resultats = []
+        lignes_vendues = []
+        lignes_resume = []
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        try:
+            self.debut_transaction_ecriture()
+            for produit_id, quantite_demandee in panier.items():
+                if quantite_demandee <= 0:
+                    resultats.append((produit_id, quantite_demandee, False, "Erreur : Quantité invalide."))
+                    continue
+
+                # Soustraction du stock uniquement si la quantité disponible est suffisante
+                self.cursor.execute("UPDATE produits SET quantite = quantite - ? WHERE id = ? AND quantite >= ?",
+                                    (quantite_demandee, produit_id, quantite_demandee))
+                if self.cursor.rowcount == 1:
+                    # Nom et prix figés dans la vente (l'historique ne dépend plus des prix actuels)
+                    self.cursor.execute("SELECT nom, prix, categorie FROM produits WHERE id = ?", (produit_id,))
+                    nom, prix, categorie = self.cursor.fetchone()
+                    resultats.append((produit_id, quantite_demandee, True, "Vente réussie !"))
+                    lignes_vendues.append((produit_id, quantite_demandee, date, prix, nom, caisse_id))
+                    lignes_resume.append((date[:10], produit_id, categorie or "Général",
+                                          quantite_demandee, quantite_demandee * prix))
+                    continue
+
+                # Aucune ligne modifiée : on distingue produit absent et stock insuffisant
+                self.cursor.execute("SELECT 1 FROM produits WHERE id = ?", (produit_id,))
+                if self.cursor.fetchone():
+                    resultats.append((produit_id, quantite_demandee, False, "Erreur : Stock insuffisant."))
+                else:
+                    resultats.append((produit_id, quantite_demandee, False, "Erreur : Produit introuvable."))
+
+            if not resultats or len(lignes_vendues) != len(resultats):
+                # Au moins une ligne en échec : annulation de toute la transaction
+                self.conn.rollback()
+                resultats = [(pid, qte, False, message if not ok else "Annulée : une autre ligne du panier a échoué.")
+                             for pid, qte, ok, message in resultats]
+                return False, resultats
+
+            # Enregistrement des ventes en lot puis commit unique (IMPORTANT)
+            self.cursor.executemany("INSERT INTO ventes (produit_id, quantite, date_vente, prix_unitaire, nom_produit, caisse_id) VALUES (?, ?, ?, ?, ?, ?)",
+                                    lignes_vendues)
+            # Mise à jour du résumé journalier dans la même transaction
+            self.cursor.executemany("""
+                INSERT INTO ventes_journalieres (jour, produit_id, categorie, quantite, chiffre_affaires)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(jour, produit_id) DO UPDATE SET
+                    quantite = quantite + excluded.quantite,
+                    chiffre_affaires = chiffre_affaires + excluded.chiffre_affaires
+            """, lignes_resume)
+            self.conn.commit()
+            for produit_id, quantite, *_ in lignes_vendues:
+                self.catalogue.ajuster_quantite(produit_id, -quantite)
+            return True, resultats
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
     def recuperer_ventes(self, date_debut=None, date_fin=None):
         """
         Récupère l'historique des ventes avec les détails des produits et les totaux en CDF.
+        Le nom et le prix sont ceux enregistrés au moment de la vente (aucune jointure).
         """
+        query, params = self.requete_ventes(date_debut, date_fin)
+        self.cursor.execute(query, params)
+        # Le résultat contient : (date, nom_produit, quantité, prix_unitaire_cdf, total_vente_cdf)
+        return self.cursor.fetchall()
+
+    def iterer_ventes(self, date_debut=None, date_fin=None, taille_lot=500):
+        """Parcourt l'historique des ventes par lots de lignes (mémoire constante, pour les rapports)."""
+        query, params = self.requete_ventes(date_debut, date_fin)
+        return self.iterer_par_lots(query, params, taille_lot)
+
+    def requete_ventes(self, date_debut=None, date_fin=None):
+        """Requête SQL (et paramètres) de l'historique des ventes filtré par dates."""
         query = """
             SELECT
                 v.date_vente,
-                p.nom,
+                v.nom_produit,
                 v.quantite,
-                p.prix,  -- Prix unitaire en CDF (devise de base)
-                (v.quantite * p.prix) AS total_vente -- Total de la vente en CDF
+                v.prix_unitaire,  -- Prix unitaire en CDF (devise de base) au moment de la vente
+                (v.quantite * v.prix_unitaire) AS total_vente -- Total de la vente en CDF
             FROM ventes v
-            JOIN produits p ON v.produit_id = p.id
         """
+        conditions, params = self.filtre_dates("v.date_vente", date_debut, date_fin)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        query += " ORDER BY v.date_vente DESC"
+        return query, params
+
+    def filtre_dates(self, colonne, date_debut=None, date_fin=None):
+        """Construit les conditions SQL (et leurs paramètres) d'un filtre de dates YYYY-MM-DD."""
         params = []
         conditions = []
-
-        # Construction dynamique des filtres de dates
         if date_debut:
-            conditions.append("v.date_vente >= ?")
+            conditions.append(f"{colonne} >= ?")
             params.append(date_debut + " 00:00:00")
         if date_fin:
-            conditions.append("v.date_vente <= ?")
+            conditions.append(f"{colonne} <= ?")
             params.append(date_fin + " 23:59:59")
-        
+        return conditions, params
+
+    def recuperer_ventes_page(self, date_debut=None, date_fin=None, apres=None, limite=200):
+        """
+        Récupère une page de l'historique des ventes (du plus récent au plus ancien).
+        Pagination par clé sur (date_vente, id) : `apres` est la clé de la dernière ligne
+        de la page précédente, ce qui évite les OFFSET coûteux sur les grandes tables.
+        """
+        query = """
+            SELECT
+                v.id,
+                v.date_vente,
+                v.nom_produit,
+                v.quantite,
+                v.prix_unitaire,
+                (v.quantite * v.prix_unitaire) AS total_vente,
+                v.caisse_id
+            FROM ventes v
+        """
+        conditions, params = self.filtre_dates("v.date_vente", date_debut, date_fin)
+        if apres:
+            conditions.append("(v.date_vente, v.id) < (?, ?)")
+            params.extend(apres)
+
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY v.date_vente DESC"
+
+        query += " ORDER BY v.date_vente DESC, v.id DESC LIMIT ?"
+        params.append(limite)
 
         self.cursor.execute(query, params)
-        # Le résultat contient : (date, nom_produit, quantité, prix_unitaire_cdf, total_vente_cdf)
+        # Le résultat contient : (id_vente, date, nom_produit, quantité, prix_unitaire_cdf, total_vente_cdf, caisse_id)
         return self.cursor.fetchall()
-        
-    def modifier_produit(self, produit_id, nom, prix, quantite, categorie="Général"): # MODIF: Ajout de categorie
-        self.cursor.execute("UPDATE produits SET nom = ?, prix = ?, quantite = ?, categorie = ? WHERE id = ?", 
-                            (nom, prix, quantite, categorie, produit_id)) # MODIF: Ajout de categorie
-        self.conn.commit()
+
+    def calculer_total_ventes(self, date_debut=None, date_fin=None):
+        """Nombre de ventes et total en CDF sur la période (agrégat SQL, sans charger les lignes)."""
+        query = """
+            SELECT COUNT(*), COALESCE(SUM(v.quantite * v.prix_unitaire), 0)
+            FROM ventes v
+        """
+        conditions, params = self.filtre_dates("v.date_vente", date_debut, date_fin)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        self.cursor.execute(query, params)
+        return self.cursor.fetchone()
+
+    def recuperer_resume_ventes(self, date_debut=None, date_fin=None, granularite="jour", par_categorie=False):
+        """
+        Totaux des ventes par période lus dans le résumé journalier (sans parcourir la table ventes).
+        granularite : "jour", "semaine" ou "mois".
+        Résultat : [(periode, quantite, chiffre_affaires_cdf)]
+        ou [(periode, categorie, quantite, chiffre_affaires_cdf)] si par_categorie.
+        """
+        periodes = {
+            "jour": "jour",
+            "semaine": "strftime('%Y-S%W', jour)",
+            "mois": "substr(jour, 1, 7)",
+        }
+        if granularite not in periodes:
+            raise ValueError(f"Granularité inconnue : {granularite}")
+
+        colonnes = periodes[granularite] + " AS periode"
+        groupes = "periode"
+        if par_categorie:
+            colonnes += ", categorie"
+            groupes += ", categorie"
+
+        query = f"SELECT {colonnes}, SUM(quantite), SUM(chiffre_affaires) FROM ventes_journalieres"
+        params = []
+        conditions = []
+        if date_debut:
+            conditions.append("jour >= ?")
+            params.append(date_debut)
+        if date_fin:
+            conditions.append("jour <= ?")
+            params.append(date_fin)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" GROUP BY {groupes} ORDER BY {groupes}"
+
+        self.cursor.execute(query, params)
+        return self.cursor.fetchall()
+
+    def reconstruire_resume_ventes(self):
+        """Recalcule entièrement la table ventes_journalieres à partir de l'historique des ventes."""
+        self.ecrire(("DELETE FROM ventes_journalieres", ()), (self.REQUETE_RECONSTRUCTION_RESUME, ()))
+
+    def modifier_produit(self, produit_id, nom, prix, quantite, categorie="Général", code_barre=None,
+                         quantite_chargee=None): # MODIF: Ajout de categorie
+        """
+        quantite est le nouveau stock total. Si quantite_chargee (le stock affiché quand la fiche a été
+        ouverte) est donné, la modification est refusée si le stock a changé depuis (vente ou réception
+        sur une caisse) : écrire le total saisi effacerait ces mouvements.
+        """
+        code_barre = (code_barre or "").strip() or None
+        requete = "UPDATE produits SET nom = ?, prix = ?, quantite = ?, categorie = ?, code_barre = ? WHERE id = ?"
+        params = (nom, prix, quantite, categorie, code_barre, produit_id) # MODIF: Ajout de categorie
+        if quantite_chargee is not None:
+            requete += " AND quantite = ?"
+            params += (quantite_chargee,)
+        try:
+            modifie = self.ecrire((requete, params)).rowcount == 1
+        except sqlite3.IntegrityError:
+            return False, f"Le code-barres {code_barre} est déjà attribué à un autre produit."
+        if not modifie:
+            self.cursor.execute("SELECT quantite FROM produits WHERE id = ?", (produit_id,))
+            actuel = self.cursor.fetchone()
+            if actuel is None:
+                return False, "Produit introuvable."
+            return False, (f"Le stock de ce produit a changé depuis l'ouverture de la fiche ({actuel[0]} en stock "
+                           f"au lieu de {quantite_chargee}). Sélectionnez de nouveau le produit et recommencez.")
+        self.catalogue.mettre_a_jour((produit_id, nom, prix, quantite, categorie, code_barre))
+        return True, f"Produit ID {produit_id} modifié avec succès (Stock Total mis à jour)."
         
     def supprimer_produit(self, produit_id):
-        self.cursor.execute("DELETE FROM produits WHERE id = ?", (produit_id,))
-        self.conn.commit()
+        self.ecrire(("DELETE FROM produits WHERE id = ?", (produit_id,)))
+        self.catalogue.retirer(produit_id)
         
     def creer_utilisateur(self, username, password, role):
         try:
-            self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", 
-                                (username, password, role))
-            self.conn.commit()
+            self.ecrire(("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password, role)))
             return True
         except sqlite3.IntegrityError:
             return False 
@@ -265,55 +1120,286 @@ class GestionBaseDeDonnees:
         self.cursor.execute("SELECT id, username, role FROM users")
         return self.cursor.fetchall()
         
-    def sauvegarder_bdd(self):
-        """Crée une copie de la base de données principale dans un dossier 'backups'."""
+    DOSSIER_SAUVEGARDES = "backups"
+    PAGES_PAR_ETAPE_SAUVEGARDE = 1024 # Pages copiées par étape (4 Mo avec des pages de 4 Kio)
+    NIVEAU_COMPRESSION_SAUVEGARDE = 6 # Le niveau 9 (défaut de gzip) est bien plus lent pour un gain négligeable
+    NB_SAUVEGARDES_CONSERVEES = 10 # Sauvegardes gardées dans backups/ (0 : aucune suppression)
+
+    def sauvegarder_bdd(self, progression=None, conserver=None):
+        """
+        Crée une sauvegarde compressée backups/backup_AAAAMMJJ_HHMMSS_ffffff.db.gz sans arrêter le magasin :
+        la copie avance par étapes de PAGES_PAR_ETAPE_SAUVEGARDE pages dans une transaction de lecture,
+        donc en mode WAL les caisses continuent d'écrire et la copie reste l'image cohérente de son début
+        (sans transaction, chaque écriture d'une autre connexion ferait recommencer la copie).
+        La copie est ensuite compressée en flux, puis les sauvegardes au-delà des `conserver` plus
+        récentes sont supprimées. À appeler hors du thread Tk (la copie d'une grosse base est longue).
+        progression(etape, fraction) est appelée pendant la "copie" puis la "compression".
+        Retourne le chemin de la sauvegarde, ou None en cas d'erreur.
+        """
+        conserver = self.NB_SAUVEGARDES_CONSERVEES if conserver is None else conserver
+        # Horodatage à la microseconde (et suffixe si le nom existe déjà) : deux sauvegardes rapprochées
+        # ne s'écrasent pas, et la purge compte bien chaque sauvegarde
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        nom = f"backup_{timestamp}"
+        suffixe = 1
+        while os.path.exists(os.path.join(self.DOSSIER_SAUVEGARDES, nom + ".db.gz")):
+            nom = f"backup_{timestamp}_{suffixe}"
+            suffixe += 1
+        backup_path = os.path.join(self.DOSSIER_SAUVEGARDES, nom + ".db.gz")
+        copie = os.path.join(self.DOSSIER_SAUVEGARDES, nom + ".db.partiel")
         try:
-            backup_dir = "backups"
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(backup_dir, f"backup_{timestamp}.db")
-            
-            backup_conn = sqlite3.connect(backup_path)
-            self.conn.backup(backup_conn)
-            backup_conn.close()
-            
+            os.makedirs(self.DOSSIER_SAUVEGARDES, exist_ok=True)
+
+            def progression_copie(statut, pages_restantes, nb_pages):
+                if nb_pages:
+                    progression("copie", 1 - pages_restantes / nb_pages)
+
+            backup_conn = sqlite3.connect(copie)
+            try:
+                self.cursor.execute("BEGIN")
+                self.cursor.execute("SELECT COUNT(*) FROM sqlite_master") # Démarre la lecture : image figée
+                self.cursor.fetchall()
+                self.conn.backup(backup_conn, pages=self.PAGES_PAR_ETAPE_SAUVEGARDE,
+                                 progress=progression_copie if progression else None)
+            finally:
+                self.conn.rollback() # Fin de la transaction de lecture
+                backup_conn.close()
+
+            taille = os.path.getsize(copie) or 1
+            niveau = self.NIVEAU_COMPRESSION_SAUVEGARDE
+            with open(copie, "rb") as source, gzip.open(backup_path + ".partiel", "wb", compresslevel=niveau) as destination:
+                lu = 0
+                while True:
+                    bloc = source.read(1 << 20)
+                    if not bloc:
+                        break
+                    destination.write(bloc)
+                    lu += len(bloc)
+                    if progression:
+                        progression("compression", lu / taille)
+            os.replace(backup_path + ".partiel", backup_path) # Jamais de sauvegarde tronquée sous le nom final
+
+            if conserver > 0:
+                self.purger_sauvegardes(conserver)
             return backup_path
         except Exception as e:
             print(f"Erreur de sauvegarde: {e}")
             return None
+        finally:
+            for fichier in (copie, backup_path + ".partiel"):
+                if os.path.exists(fichier):
+                    os.remove(fichier)
+
+    def purger_sauvegardes(self, conserver):
+        """Supprime les sauvegardes (.db et .db.gz) au-delà des `conserver` plus récentes ; retourne leur nombre."""
+        # Noms horodatés AAAAMMJJ_HHMMSS[_ffffff] : l'ordre alphabétique est l'ordre chronologique
+        # ("." < "_" : une ancienne sauvegarde sans microsecondes passe avant celles de la même seconde)
+        sauvegardes = sorted((nom for nom in os.listdir(self.DOSSIER_SAUVEGARDES)
+                              if nom.startswith("backup_") and nom.endswith((".db", ".db.gz"))), reverse=True)
+        for nom in sauvegardes[conserver:]:
+            os.remove(os.path.join(self.DOSSIER_SAUVEGARDES, nom))
+        return len(sauvegardes[conserver:])
 
     def restaurer_bdd(self, backup_filepath):
-        """Restaure la base de données principale à partir d'un fichier de sauvegarde."""
+        """Restaure la base de données principale à partir d'un fichier de sauvegarde (.db ou .db.gz)."""
         try:
+            # En mode WAL : on vide le journal dans la base avant de la remplacer
+            self.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
             self.conn.close()
-            shutil.copyfile(backup_filepath, self.db_name)
-            self.conn = sqlite3.connect(self.db_name)
-            self.cursor = self.conn.cursor()
-            
+            self.catalogue.invalider()
+            if backup_filepath.endswith(".gz"):
+                with gzip.open(backup_filepath, "rb") as source, open(self.db_name, "wb") as destination:
+                    shutil.copyfileobj(source, destination)
+            else:
+                shutil.copyfile(backup_filepath, self.db_name)
+            self.ouvrir_connexion()
+            # Une ancienne sauvegarde peut avoir un schéma antérieur : mise à niveau
+            self.creer_tables()
+            self.appliquer_migrations()
+
             return True
         except Exception as e:
             print(f"Erreur de restauration: {e}")
             try:
-                self.conn = sqlite3.connect(self.db_name)
-                self.cursor = self.conn.cursor()
+                self.ouvrir_connexion()
             except:
                 pass 
             return False
             
+    # Exports CSV : {table: (entêtes, requête, colonne de date du filtre ou None, tri)}
+    EXPORTS_CSV = {
+        "produits": (("id", "nom", "prix", "quantite", "categorie", "code_barre"),
+                     "SELECT id, nom, prix, quantite, categorie, code_barre FROM produits", None, " ORDER BY id"),
+        "ventes": (("id", "date_vente", "produit_id", "nom_produit", "quantite", "prix_unitaire", "caisse_id"),
+                   "SELECT id, date_vente, produit_id, nom_produit, quantite, prix_unitaire, caisse_id FROM ventes",
+                   "date_vente", " ORDER BY date_vente, id"),
+        "journal_stock": (("id", "date_entree", "produit_id", "nom_produit", "quantite_ajoutee"),
+                          """SELECT j.id, j.date_entree, j.produit_id, p.nom, j.quantite_ajoutee
+                             FROM journal_stock j LEFT JOIN produits p ON p.id = j.produit_id""",
+                          "j.date_entree", " ORDER BY j.date_entree, j.id"),
+    }
+
+    def exporter_csv(self, table, chemin, date_debut=None, date_fin=None, progression=None, taille_lot=1000):
+        """
+        Écrit une table (produits, ventes ou journal_stock) dans un fichier CSV, lue par lots
+        (mémoire constante). progression(nb_lignes, None) est appelée après chaque lot.
+        Retourne le nombre de lignes exportées.
+        """
+        entetes, query, colonne_date, tri = self.EXPORTS_CSV[table]
+        params = []
+        if colonne_date:
+            conditions, params = self.filtre_dates(colonne_date, date_debut, date_fin)
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+        query += tri
+
+        nb_lignes = 0
+        # Séparateur ";" et BOM UTF-8 : le fichier s'ouvre directement dans un tableur en français
+        with open(chemin, "w", encoding="utf-8-sig", newline="") as fichier:
+            ecrivain = csv.writer(fichier, delimiter=";")
+            ecrivain.writerow(entetes)
+            for lot in self.iterer_par_lots(query, params, taille_lot):
+                ecrivain.writerows(lot)
+                nb_lignes += len(lot)
+                if progression:
+                    progression(nb_lignes, None)
+        return nb_lignes
+
+    def importer_produits_csv(self, chemin, progression=None, taille_lot=1000):
+        """
+        Importe des produits depuis un fichier CSV lu en flux, le tout en UNE transaction.
+        Colonnes : nom, prix, quantite (obligatoires), categorie, code_barre, id (facultatives) ;
+        séparateur "," ";" ou tabulation. Clé de mise à jour : id s'il est renseigné (le code-barres de la
+        ligne est alors attribué à ce produit), sinon code_barre ; sans clé le produit est ajouté.
+        Les lignes invalides, ou dont l'id et le code-barres désignent deux produits différents,
+        sont ignorées et signalées.
+        progression(nb_lignes, fraction_du_fichier) est appelée après chaque lot.
+        Retourne (succes, message).
+        """
+        taille_fichier = os.path.getsize(chemin) or 1
+        nb_importes = nb_rejetes = 0
+        erreurs = []
+
+        with open(chemin, "rb") as brut:
+            texte = io.TextIOWrapper(brut, encoding="utf-8-sig", newline="")
+            echantillon = texte.read(4096)
+            texte.seek(0)
+            try:
+                dialecte = csv.Sniffer().sniff(echantillon, delimiters=",;\t")
+            except csv.Error:
+                dialecte = csv.excel
+            lecteur = csv.DictReader(texte, dialect=dialecte)
+            lecteur.fieldnames = [(colonne or "").strip().lower() for colonne in (lecteur.fieldnames or [])]
+            manquantes = {"nom", "prix", "quantite"} - set(lecteur.fieldnames)
+            if manquantes:
+                return False, f"Colonnes obligatoires absentes du fichier : {', '.join(sorted(manquantes))}."
+
+            try:
+                self.debut_transaction_ecriture()
+                avec_id, sans_id = [], []
+                codes_importes = {} # {code_barre: id} attribués par les lignes avec id déjà lues
+                for ligne in lecteur:
+                    try:
+                        produit = self.valider_ligne_produit(ligne)
+                        self.verifier_code_barre_import(produit, codes_importes)
+                    except ValueError as e:
+                        nb_rejetes += 1
+                        if len(erreurs) < 10:
+                            erreurs.append(f"Ligne {lecteur.line_num} : {e}")
+                        continue
+                    (sans_id if produit[0] is None else avec_id).append(produit)
+                    if len(avec_id) + len(sans_id) >= taille_lot:
+                        nb_importes += self.ecrire_lot_produits(avec_id, sans_id)
+                        avec_id, sans_id = [], []
+                        if progression:
+                            progression(nb_importes + nb_rejetes, brut.tell() / taille_fichier)
+                nb_importes += self.ecrire_lot_produits(avec_id, sans_id)
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback() # Aucun produit importé
+                raise
+            finally:
+                self.catalogue.invalider()
+
+        if progression:
+            progression(nb_importes + nb_rejetes, 1.0)
+        message = f"{nb_importes} produit(s) importé(s) ou mis à jour, {nb_rejetes} ligne(s) rejetée(s)."
+        if erreurs:
+            message += "\n" + "\n".join(erreurs)
+        return True, message
+
+    def valider_ligne_produit(self, ligne):
+        """Convertit une ligne CSV en (id, nom, prix, quantite, categorie, code_barre) ; ValueError si invalide."""
+        nom = (ligne.get("nom") or "").strip()
+        if not nom:
+            raise ValueError("nom vide")
+        texte_prix = (ligne.get("prix") or "").replace(" ", "").replace(",", ".")
+        try:
+            prix = float(texte_prix)
+        except ValueError:
+            raise ValueError(f"prix invalide ({texte_prix!r})") from None
+        if not 0 <= prix < float("inf"):
+            raise ValueError(f"prix invalide ({texte_prix!r})")
+        texte_quantite = (ligne.get("quantite") or "").strip()
+        try:
+            quantite = int(texte_quantite)
+        except ValueError:
+            raise ValueError(f"quantité invalide ({texte_quantite!r})") from None
+        if quantite < 0:
+            raise ValueError(f"quantité négative ({quantite})")
+        texte_id = (ligne.get("id") or "").strip()
+        try:
+            produit_id = int(texte_id) if texte_id else None
+        except ValueError:
+            raise ValueError(f"id invalide ({texte_id!r})") from None
+        categorie = (ligne.get("categorie") or "").strip() or "Général"
+        code_barre = (ligne.get("code_barre") or "").strip() or None
+        return produit_id, nom, prix, quantite, categorie, code_barre
+
+    def verifier_code_barre_import(self, produit, codes_importes):
+        """ValueError si la ligne (avec id) attribue un code-barres déjà porté par un autre produit."""
+        produit_id, code_barre = produit[0], produit[5]
+        if produit_id is None or not code_barre:
+            return
+        proprietaire = codes_importes.get(code_barre)
+        if proprietaire is None:
+            self.cursor.execute("SELECT id FROM produits WHERE code_barre = ?", (code_barre,))
+            trouve = self.cursor.fetchone()
+            proprietaire = trouve[0] if trouve else None
+        if proprietaire not in (None, produit_id):
+            raise ValueError(f"le code-barres {code_barre} appartient au produit ID {proprietaire}, pas à l'ID {produit_id}")
+        codes_importes[code_barre] = produit_id
+
+    def ecrire_lot_produits(self, avec_id, sans_id):
+        """Insère ou met à jour un lot de produits validés (dans la transaction en cours)."""
+        if avec_id:
+            # Mise à jour par id ; le code-barres existant n'est pas effacé par une ligne qui n'en a pas
+            self.cursor.executemany("""
+                INSERT INTO produits (id, nom, prix, quantite, categorie, code_barre) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    nom = excluded.nom, prix = excluded.prix,
+                    quantite = excluded.quantite, categorie = excluded.categorie,
+                    code_barre = COALESCE(excluded.code_barre, code_barre)
+            """, avec_id)
+        if sans_id:
+            # Mise à jour par code-barres ; sans code-barres (NULL, jamais en conflit) le produit est ajouté
+            self.cursor.executemany("""
+                INSERT INTO produits (nom, prix, quantite, categorie, code_barre) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(code_barre) DO UPDATE SET
+                    nom = excluded.nom, prix = excluded.prix,
+                    quantite = excluded.quantite, categorie = excluded.categorie
+            """, [produit[1:] for produit in sans_id])
+        return len(avec_id) + len(sans_id)
+
     def supprimer_utilisateur(self, user_id):
         if user_id == 1:
             return False 
         
-        self.cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        self.conn.commit()
+        self.ecrire(("DELETE FROM users WHERE id = ?", (user_id,)))
         return True
         
     def changer_mot_de_passe(self, user_id, new_password):
-        self.cursor.execute("UPDATE users SET password = ? WHERE id = ?", 
-                            (new_password, user_id))
-        self.conn.commit()
+        self.ecrire(("UPDATE users SET password = ? WHERE id = ?", (new_password, user_id)))
         
     def get_taux_usd_cdf(self):
         """Récupère le taux de change (CDF par 1 USD)."""
@@ -328,17 +1414,456 @@ class GestionBaseDeDonnees:
 
     def set_taux_usd_cdf(self, nouveau_taux):
         """Met à jour le taux de change USD vers CDF."""
-        self.cursor.execute("""
-            INSERT OR REPLACE INTO configuration (cle, valeur) VALUES ('taux_usd_cdf', ?)
-        """, (str(nouveau_taux),))
-        self.conn.commit()
+        self.ecrire(("INSERT OR REPLACE INTO configuration (cle, valeur) VALUES ('taux_usd_cdf', ?)", (str(nouveau_taux),)))
+
+
+# --- PARTIE 1 bis : MODE SERVEUR (une base partagée par les caisses du réseau local) ---
+PORT_SERVEUR = 8765
+
+
+class ServeurBaseDeDonnees:
+    """
+    Processus propriétaire de la base : les méthodes de GestionBaseDeDonnees sont appelées en JSON
+    sur HTTP (POST /rpc) par les caisses (ClientGestionBaseDeDonnees), au lieu de partager le fichier
+    SQLite sur le réseau (SMB), ce qui est lent et peut corrompre la base.
+    - Appel : {"methode": nom, "args": [...], "kwargs": {...}} ; réponse {"resultat": ...}
+      ou {"erreur": message, "type": nom de l'exception}.
+    - Lot : une liste d'appels, exécutés dans l'ordre sur la même connexion en un seul aller-retour ;
+      la réponse est la liste des réponses.
+    Les requêtes sont exécutées par un pool de threads de taille fixe, chacun propriétaire de sa
+    connexion SQLite : le nombre de connexions ne dépend pas du nombre de caisses connectées.
+    """
+    # Méthodes accessibles à distance. Les autres (fichiers locaux, restauration...) sont refusées.
+    METHODES_LECTURE = {
+        "verifier_utilisateur", "recuperer_utilisateurs", "get_taux_usd_cdf", "trouver_par_code",
+        "recuperer_ventes", "recuperer_ventes_page", "calculer_total_ventes", "recuperer_resume_ventes",
+        "recuperer_journal_stock", "recuperer_journal_stock_page", "calculer_total_journal_stock",
+    }
+    METHODES_ECRITURE = {
+        "ajouter_produit", "modifier_produit", "supprimer_produit", "enregistrer_entree_stock",
+        "enregistrer_reception", "faire_vente_panier", "creer_utilisateur", "supprimer_utilisateur",
+        "changer_mot_de_passe", "set_taux_usd_cdf", "reconstruire_resume_ventes",
+    }
+    # Méthodes propres au serveur, appelées avec la connexion du thread : methode(db, *args)
+    METHODES_SERVEUR = {"version_donnees", "lire_catalogue"}
+
+    def __init__(self, db_name, profil="rapide", caisse_id=None, taille_pool=4, jeton=None):
+        self.db_name = db_name
+        self.profil = profil
+        self.caisse_id = caisse_id
+        self.jeton = jeton # Si défini, chaque requête doit porter l'en-tête X-Jeton correspondant
+        # Ouverture initiale : création des tables et migrations avant d'accepter des requêtes
+        GestionBaseDeDonnees(db_name, profil=profil, caisse_id=caisse_id).conn.close()
+        self.locaux = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=taille_pool, thread_name_prefix="bdd")
+        # Génération des données : augmente après chaque écriture (les caisses ne relisent le catalogue
+        # que si elle a changé). Initialisée à l'heure de démarrage pour qu'un redémarrage soit détecté.
+        self.verrou = threading.Lock()
+        self.generation = time.time_ns()
+
+    def creer_serveur_http(self, hote="127.0.0.1", port=PORT_SERVEUR):
+        """Serveur HTTP (un thread par caisse connectée) ; port=0 choisit un port libre."""
+        serveur_bdd = self
+
+        class GestionnaireRPC(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Connexions persistantes : pas de nouvelle connexion TCP par appel
+            disable_nagle_algorithm = True # En-têtes et corps partent sans attendre l'accusé de réception du client
+
+            def do_POST(self):
+                serveur_bdd.traiter_requete(self)
+
+            def log_message(self, format, *args):
+                pass # Pas de ligne de journal par appel
+
+        return http.server.ThreadingHTTPServer((hote, port), GestionnaireRPC)
+
+    def traiter_requete(self, requete):
+        if self.jeton and requete.headers.get("X-Jeton") != self.jeton:
+            return self.repondre(requete, 403, {"erreur": "Jeton invalide.", "type": "PermissionError"})
+        if requete.path != "/rpc":
+            return self.repondre(requete, 404, {"erreur": f"Chemin inconnu : {requete.path}", "type": "ValueError"})
+        try:
+            corps = json.loads(requete.rfile.read(int(requete.headers.get("Content-Length", 0))))
+        except ValueError as e:
+            return self.repondre(requete, 400, {"erreur": f"Requête JSON invalide : {e}", "type": "ValueError"})
+
+        lot = isinstance(corps, list)
+        reponses = self.pool.submit(self.executer, corps if lot else [corps]).result()
+        self.repondre(requete, 200, reponses if lot else reponses[0])
+
+    def repondre(self, requete, code, contenu):
+        donnees = json.dumps(contenu, ensure_ascii=False).encode("utf-8")
+        requete.send_response(code)
+        requete.send_header("Content-Type", "application/json; charset=utf-8")
+        requete.send_header("Content-Length", str(len(donnees)))
+        try:
+            requete.end_headers()
+            requete.wfile.write(donnees)
+        except (BrokenPipeError, ConnectionResetError):
+            requete.close_connection = True # La caisse a abandonné la requête (délai dépassé)
+
+    def connexion(self):
+        """Connexion SQLite propre au thread du pool (ouverte au premier appel)."""
+        db = getattr(self.locaux, 'db', None)
+        if db is None:
+            db = self.locaux.db = GestionBaseDeDonnees(self.db_name, profil=self.profil, caisse_id=self.caisse_id)
+        return db
+
+    def executer(self, appels):
+        """Exécute une liste d'appels sur la connexion du thread ; une erreur n'arrête pas les appels suivants."""
+        db = self.connexion()
+        reponses = []
+        for appel in appels:
+            try:
+                reponses.append({"resultat": self.executer_appel(db, appel)})
+            except Exception as e:
+                reponses.append({"erreur": str(e), "type": type(e).__name__})
+        return reponses
+
+    def executer_appel(self, db, appel):
+        methode = appel.get("methode")
+        args = appel.get("args", [])
+        kwargs = appel.get("kwargs", {})
+        if methode in self.METHODES_SERVEUR:
+            return getattr(self, methode)(db, *args, **kwargs)
+        if methode in self.METHODES_LECTURE:
+            return getattr(db, methode)(*args, **kwargs)
+        if methode in self.METHODES_ECRITURE:
+            resultat = getattr(db, methode)(*args, **kwargs)
+            # Écriture refusée ou annulée (False, (False, message)...) : les caisses n'ont rien à relire
+            if resultat is not False and not (isinstance(resultat, tuple) and resultat and resultat[0] is False):
+                with self.verrou:
+                    self.generation += 1
+            return resultat
+        raise ValueError(f"Méthode non autorisée : {methode}")
+
+    def version_donnees(self, db):
+        """Équivalent de PRAGMA data_version pour les caisses : change après chaque écriture."""
+        with self.verrou:
+            return self.generation
+
+    def lire_catalogue(self, db, generation_connue=None):
+        """(generation, produits) si les données ont changé depuis generation_connue, sinon None."""
+        with self.verrou:
+            generation = self.generation
+        if generation == generation_connue:
+            return None
+        return generation, db.recuperer_produits()
+
+    def arreter(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ClientGestionBaseDeDonnees:
+    """
+    Caisse cliente d'un ServeurBaseDeDonnees, avec les mêmes méthodes que GestionBaseDeDonnees :
+    ApplicationEcommerce, les rapports et ExecuteurTaches l'utilisent sans savoir où est la base.
+    Le catalogue des produits reste en mémoire côté caisse : recherche, listes et lecture des
+    codes-barres se font sans aller-retour. Il est téléchargé au premier accès, puis seulement par
+    actualiser_catalogue, qui ne le retélécharge que si le serveur a enregistré une écriture depuis
+    (l'interface l'appelle depuis le thread base de données et recharge son catalogue avec la réponse).
+    Comme une connexion sqlite3, une instance ne doit être utilisée que par un seul thread.
+    """
+
+    def __init__(self, serveur, caisse_id=None, jeton=None, delai=30):
+        adresse = serveur.split("://")[-1].rstrip("/") # "hôte:port", "hôte" ou "http://hôte:port"
+        hote, _, port = adresse.rpartition(":")
+        self.db_name = serveur
+        self.caisse_id = caisse_id or platform.node() or "principale"
+        self.jeton = jeton
+        self.conn = http.client.HTTPConnection(hote or adresse, int(port) if hote else PORT_SERVEUR, timeout=delai)
+        self.catalogue = CatalogueProduits()
+        self.par_code = {} # {code_barre: produit} du catalogue en mémoire
+        self.version_par_code = None # Version du catalogue indexée dans par_code
+        # Compteurs de contention : les verrous sont gérés par le serveur
+        self.nb_attentes_verrou = 0
+        self.temps_attente_verrou = 0.0
+        self.nb_reessais_verrou = 0
+
+    def __getattr__(self, nom):
+        # Méthodes de GestionBaseDeDonnees exécutées telles quelles par le serveur
+        if nom in ServeurBaseDeDonnees.METHODES_LECTURE or nom in ServeurBaseDeDonnees.METHODES_ECRITURE:
+            return lambda *args, **kwargs: self.appeler(nom, *args, **kwargs)
+        raise AttributeError(nom)
+
+    def appeler(self, methode, *args, **kwargs):
+        return self.appeler_lot([(methode, args, kwargs)])[0]
+
+    def appeler_lot(self, appels):
+        """
+        Exécute [(methode, args, kwargs), ...] en un seul aller-retour et retourne la liste des résultats.
+        La première erreur est levée (avec son type s'il s'agit d'une erreur sqlite3).
+        """
+        corps = [{"methode": methode, "args": list(args), "kwargs": kwargs} for methode, args, kwargs in appels]
+        # Seuls les appels sans écriture sont renvoyés si la connexion persistante a été coupée
+        reessayable = all(appel["methode"] not in ServeurBaseDeDonnees.METHODES_ECRITURE for appel in corps)
+        resultats = []
+        for reponse in self.envoyer(corps, reessayable):
+            if "erreur" in reponse:
+                classe = getattr(sqlite3, reponse.get("type", ""), None)
+                if not (isinstance(classe, type) and issubclass(classe, sqlite3.Error)):
+                    classe = RuntimeError
+                raise classe(reponse["erreur"])
+            resultats.append(reponse["resultat"])
+        return resultats
+
+    def envoyer(self, corps, reessayable):
+        donnees = json.dumps(corps).encode("utf-8")
+        entetes = {"Content-Type": "application/json"}
+        if self.jeton:
+            entetes["X-Jeton"] = self.jeton
+        for tentative in range(2):
+            try:
+                self.conn.request("POST", "/rpc", donnees, entetes)
+                reponse = self.conn.getresponse()
+                contenu = json.loads(reponse.read())
+                break
+            except Exception:
+                # Délai dépassé, serveur redémarré, réponse illisible... : la connexion est dans un état
+                # inconnu (requête envoyée sans réponse lue), la prochaine requête en ouvre une nouvelle
+                self.conn.close()
+                if tentative or not reessayable:
+                    raise
+        if reponse.status != 200:
+            raise RuntimeError(f"Serveur {self.db_name} : {contenu.get('erreur', reponse.reason)}")
+        return contenu
+
+    def version_donnees(self):
+        return self.appeler("version_donnees")
+
+    def lire_catalogue(self, generation_connue=None):
+        """(generation, produits) si le serveur a enregistré une écriture depuis generation_connue, sinon None."""
+        return self.appeler("lire_catalogue", generation_connue)
+
+    def actualiser_catalogue(self):
+        """Retélécharge le catalogue en mémoire s'il a changé sur le serveur (un aller-retour)."""
+        reponse = self.lire_catalogue(self.catalogue.data_version if self.catalogue.charge else None)
+        if reponse is not None:
+            generation, produits = reponse
+            self.catalogue.charger(produits, generation)
+        return self.catalogue
+
+    def recuperer_catalogue(self):
+        """Catalogue en mémoire, téléchargé seulement au premier accès (voir actualiser_catalogue)."""
+        if not self.catalogue.charge:
+            return self.actualiser_catalogue()
+        return self.catalogue
+
+    def trouver_par_code(self, code):
+        """Produit portant ce code-barres dans le catalogue en mémoire, ou None."""
+        code = (code or "").strip()
+        if not code:
+            return None
+        catalogue = self.recuperer_catalogue()
+        if catalogue.version != self.version_par_code:
+            self.par_code = {produit[5]: produit for produit in catalogue.produits.values() if produit[5]}
+            self.version_par_code = catalogue.version
+        return self.par_code.get(code)
+
+    def recuperer_categories(self):
+        return self.recuperer_catalogue().categories()
+
+    def recuperer_produits(self, categorie_filtre=None):
+        return self.recuperer_catalogue().liste(categorie_filtre)
+
+    def rechercher_produits(self, texte, categorie_filtre=None, limite=20):
+        return self.recuperer_catalogue().rechercher(texte, categorie_filtre, limite)
+
+    def faire_vente_panier(self, panier):
+        # Paires plutôt que dictionnaire : les clés JSON sont des chaînes
+        succes, resultats = self.appeler("faire_vente_panier", list(panier.items()), self.caisse_id)
+        return succes, [tuple(resultat) for resultat in resultats]
+
+    def faire_une_vente(self, produit_id, quantite_demandee):
+        succes, resultats = self.faire_vente_panier({produit_id: quantite_demandee})
+        return succes, resultats[0][3]
+
+    def iterer_ventes(self, date_debut=None, date_fin=None, taille_lot=500):
+        """Mêmes lots que GestionBaseDeDonnees.iterer_ventes, une page (un aller-retour) par lot."""
+        apres = None
+        while True:
+            page = self.recuperer_ventes_page(date_debut, date_fin, apres, taille_lot)
+            if page:
+                # (date, nom_produit, quantité, prix_unitaire_cdf, total_vente_cdf) comme requete_ventes
+                yield [tuple(vente[1:6]) for vente in page]
+            if len(page) < taille_lot:
+                break
+            apres = (page[-1][1], page[-1][0])
+
+    def iterer_journal_stock(self, date_debut=None, date_fin=None, taille_lot=500):
+        """Mêmes lots que GestionBaseDeDonnees.iterer_journal_stock, une page par lot."""
+        apres = None
+        while True:
+            page = self.recuperer_journal_stock_page(date_debut, date_fin, apres, taille_lot)
+            if page:
+                yield [tuple(entree[1:4]) for entree in page] # (date_entree, nom_produit, quantite_ajoutee)
+            if len(page) < taille_lot:
+                break
+            apres = (page[-1][1], page[-1][0])
+
+    def sauvegarder_bdd(self, progression=None, conserver=None):
+        # Les sauvegardes (et la suppression des plus anciennes) ne se décident pas depuis une caisse
+        print("Erreur de sauvegarde: la base appartient au serveur, sauvegardez-la sur le poste serveur.")
+        return None
+
+    def restaurer_bdd(self, backup_filepath):
+        print("Erreur de restauration: la base appartient au serveur, restaurez-la sur le poste serveur.")
+        return False
+
+    def importer_produits_csv(self, chemin, progression=None, taille_lot=1000):
+        return False, "Import impossible depuis une caisse : utilisez la commande import sur le poste serveur."
+
+    def exporter_csv(self, table, chemin, date_debut=None, date_fin=None, progression=None, taille_lot=1000):
+        raise RuntimeError("Export impossible depuis une caisse : utilisez la commande export sur le poste serveur.")
+
+
+def ouvrir_base(db_name, profil="rapide", caisse_id=None, serveur=None, jeton=None):
+    """Connexion au fichier SQLite local, ou au serveur de caisses si serveur ("hôte:port") est donné."""
+    if serveur:
+        return ClientGestionBaseDeDonnees(serveur, caisse_id=caisse_id, jeton=jeton)
+    return GestionBaseDeDonnees(db_name, profil=profil, caisse_id=caisse_id)
 
 
 # --- PARTIE 2 : INTERFACE GRAPHIQUE ET RBAC (Frontend) ---
+class ProfileurInterface:
+    """
+    Mode --profil-ui : chronomètre les rappels Tk de ApplicationEcommerce (méthodes action_*, rafraichir_*...)
+    en séparant le temps passé dans la base (appels à app.db) du temps passé dans les widgets, et
+    mesure les blocages de la boucle Tk avec un battement root.after : un battement en retard signifie
+    que la fenêtre n'a pas pu se redessiner ni répondre pendant ce retard.
+    À la fermeture : rapport trié par temps total sur la sortie d'erreur, et selon sortie un fichier
+    CSV (.csv) ou un profil cProfile des rappels (.prof, à lire avec python -m pstats).
+    """
+    PREFIXES = ("action_", "rafraichir_", "afficher_", "fin_", "selectionner_")
+    INTERVALLE_BATTEMENT = 50 # ms
+    SEUIL_BLOCAGE = 100 # ms de retard du battement au-delà desquelles la boucle Tk est considérée bloquée
+
+    def __init__(self, sortie=None):
+        self.sortie = sortie
+        self.rappels = {} # {nom: [appels, total_ms, max_ms, bdd_ms]}
+        self.pile = [] # Temps base de données de chaque rappel en cours (rappels imbriqués)
+        self.blocages = [] # [(retard_ms, rappels exécutés depuis le battement précédent)]
+        self.rappels_recents = set()
+        self.profil = None
+        if sortie and sortie.endswith(".prof"):
+            import cProfile # Seulement pour ce mode de diagnostic
+            self.profil = cProfile.Profile()
+
+    def instrumenter(self, app):
+        """À appeler avant la création des widgets : ils capturent les méthodes au moment de leur création."""
+        for nom in dir(type(app)):
+            if nom.startswith(self.PREFIXES):
+                setattr(app, nom, self.envelopper(nom, getattr(app, nom)))
+        app.db = BaseChronometree(app.db, self)
+        self.root = app.root
+        self.dernier_battement = time.perf_counter()
+        self.id_battement = self.root.after(self.INTERVALLE_BATTEMENT, self.battement)
+
+    def envelopper(self, nom, methode):
+        def rappel(*args, **kwargs):
+            if not self.pile and self.profil:
+                self.profil.enable()
+            self.pile.append(0.0)
+            debut = time.perf_counter()
+            try:
+                return methode(*args, **kwargs)
+            finally:
+                duree = (time.perf_counter() - debut) * 1000
+                bdd = self.pile.pop()
+                if self.pile:
+                    self.pile[-1] += bdd # Le temps base de données compte aussi pour le rappel englobant
+                elif self.profil:
+                    self.profil.disable()
+                stats = self.rappels.setdefault(nom, [0, 0.0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += duree
+                stats[2] = max(stats[2], duree)
+                stats[3] += bdd
+                self.rappels_recents.add(nom)
+        return rappel
+
+    def temps_bdd(self, duree_ms):
+        if self.pile: # Les appels hors rappel (surveillance de la base) ne sont pas comptés
+            self.pile[-1] += duree_ms
+
+    def battement(self):
+        maintenant = time.perf_counter()
+        retard = (maintenant - self.dernier_battement) * 1000 - self.INTERVALLE_BATTEMENT
+        if retard > self.SEUIL_BLOCAGE:
+            self.blocages.append((retard, sorted(self.rappels_recents)))
+        self.rappels_recents = set()
+        self.dernier_battement = maintenant
+        self.id_battement = self.root.after(self.INTERVALLE_BATTEMENT, self.battement)
+
+    def terminer(self):
+        """Arrête le battement et écrit le rapport (appelé par ApplicationEcommerce.quitter)."""
+        self.root.after_cancel(self.id_battement)
+        lignes = sorted(((nom, appels, total, maximum, bdd) for nom, (appels, total, maximum, bdd) in self.rappels.items()),
+                        key=lambda ligne: ligne[2], reverse=True)
+        entetes = ("Rappel", "Appels", "Total ms", "Moy. ms", "Max ms", "BDD ms", "Widgets ms")
+        print(f"\n{entetes[0]:<36} " + " ".join(f"{entete:>10}" for entete in entetes[1:]), file=sys.stderr)
+        for nom, appels, total, maximum, bdd in lignes:
+            print(f"{nom:<36} {appels:>10} {total:>10.1f} {total / appels:>10.2f} {maximum:>10.1f} "
+                  f"{bdd:>10.1f} {total - bdd:>10.1f}", file=sys.stderr)
+
+        print(f"\nBlocages de la boucle Tk (> {self.SEUIL_BLOCAGE} ms) : {len(self.blocages)}, "
+              f"total {sum(retard for retard, _ in self.blocages):.0f} ms", file=sys.stderr)
+        for retard, rappels in sorted(self.blocages, reverse=True)[:10]:
+            print(f"  {retard:>8.0f} ms  {', '.join(rappels) or '(rappel non instrumenté ou rendu Tk)'}", file=sys.stderr)
+
+        if self.profil:
+            self.profil.dump_stats(self.sortie)
+            print(f"Profil cProfile des rappels écrit dans : {self.sortie} (python -m pstats {self.sortie})", file=sys.stderr)
+        elif self.sortie:
+            with open(self.sortie, "w", encoding="utf-8-sig", newline="") as fichier:
+                ecrivain = csv.writer(fichier, delimiter=";")
+                ecrivain.writerow(entetes)
+                ecrivain.writerows((nom, appels, round(total, 3), round(total / appels, 3), round(maximum, 3),
+                                    round(bdd, 3), round(total - bdd, 3)) for nom, appels, total, maximum, bdd in lignes)
+            print(f"Rapport des rappels écrit dans : {self.sortie}", file=sys.stderr)
+
+
+class BaseChronometree:
+    """Enveloppe app.db en mode --profil-ui : le temps passé dans ses méthodes compte comme temps base de données."""
+
+    def __init__(self, db, profileur):
+        self.db = db
+        self.profileur = profileur
+
+    def __getattr__(self, nom):
+        attribut = getattr(self.db, nom)
+        if not callable(attribut):
+            return attribut # db_name, caisse_id...
+
+        def appel(*args, **kwargs):
+            debut = time.perf_counter()
+            try:
+                return attribut(*args, **kwargs)
+            finally:
+                self.profileur.temps_bdd((time.perf_counter() - debut) * 1000)
+        return appel
+
+
 class ApplicationEcommerce:
-    def __init__(self, root):
-        self.db = GestionBaseDeDonnees()
+    TAILLE_PAGE_HISTORIQUE = 200 # Lignes chargées à la fois dans l'historique des ventes
+    INTERVALLE_SURVEILLANCE = 2000 # ms entre deux vérifications des modifications faites par les autres caisses
+    NB_RESULTATS_RECHERCHE = 20 # Produits proposés par la recherche de la caisse
+    # Noms des onglets de l'espace principal
+    ONGLET_VENDEUR = "Espace Vendeur (Caisse)"
+    ONGLET_GERANT = "Espace Gérant (Stock)"
+    ONGLET_HISTORIQUE = "Historique des Ventes"
+    ONGLET_JOURNAL = "Journal de Stock (Entrées)"
+    ONGLET_ADMIN = "Administration"
+
+    def __init__(self, root, db_name="mon_magasin.db", profil_bdd="rapide", caisse_id=None, serveur=None, jeton=None,
+                 profileur=None):
+        # Base locale (profil "rapide" ou "durable"), ou serveur de caisses si serveur est donné
+        self.db = ouvrir_base(db_name, profil_bdd, caisse_id, serveur, jeton)
+        self.serveur = serveur
         self.root = root
+        self.profileur = profileur # ProfileurInterface en mode --profil-ui
+        if profileur:
+            profileur.instrumenter(self) # Avant la création de tout widget
         
         # Initialisation des variables de session
         self.current_user_id = None 
@@ -348,7 +1873,11 @@ class ApplicationEcommerce:
         self.panier = {} # {produit_id: quantite}
         # Dictionnaire pour stocker les détails du produit {id: {nom, prix, stock, categorie}}
         self.produits_details = {} 
+        self.version_produits_details = None # Version du catalogue utilisée pour produits_details
+        self.versions_affichees = {} # {onglet: version du catalogue affichée dans ses widgets}
         self.current_category_filter = "Toutes les catégories" # AJOUT: Filtre de catégorie actif
+        # Dernières valeurs affichées dans les comboboxes (pour ne les reconstruire qu'en cas de changement)
+        self.valeurs_combobox = {}
         
         # Configuration initiale de la fenêtre de connexion
         self.root.title("Logiciel Gestion E-Commerce (Connexion)")
@@ -358,7 +1887,101 @@ class ApplicationEcommerce:
         self.main_frame = ctk.CTkFrame(self.root)
         self.main_frame.pack(fill="both", expand=True)
 
+        # Travail lourd (ventes, historique, journal, exports) exécuté hors de la boucle Tk
+        self.executeur = ExecuteurTaches(self.root, self.db.db_name, profil=profil_bdd,
+                                         au_changement_occupation=self.afficher_occupation,
+                                         a_erreur_defaut=self.erreur_tache,
+                                         caisse_id=self.db.caisse_id, serveur=serveur, jeton=jeton)
+        self.root.protocol("WM_DELETE_WINDOW", self.quitter)
+
+        # Plusieurs caisses sur la même base : rafraîchissement quand une autre connexion l'a modifiée.
+        # Le catalogue est lu par le thread base de données, dès maintenant pendant la connexion.
+        self.lecture_catalogue_en_cours = False
+        self.version_catalogue_demandee = None # Version du catalogue quand la lecture a été demandée
+        self.actualiser_catalogue()
+        self.id_surveillance = self.root.after(self.INTERVALLE_SURVEILLANCE, self.surveiller_base)
+
         self.montrer_page_connexion()
+
+    def quitter(self):
+        self.root.after_cancel(self.id_surveillance)
+        if self.profileur:
+            self.profileur.terminer()
+        self.executeur.arreter()
+        self.root.destroy()
+
+    def afficher_occupation(self, occupe):
+        """Indicateur d'activité pendant qu'une tâche d'arrière-plan est en cours."""
+        self.root.configure(cursor="watch" if occupe else "")
+        if hasattr(self, 'label_occupe') and self.label_occupe.winfo_exists():
+            self.label_occupe.configure(text="⏳ Traitement en cours..." if occupe else "")
+
+    def surveiller_base(self):
+        """Vérifie régulièrement si une autre caisse, ou le thread base de données, a modifié les données."""
+        try:
+            self.rafraichir_statistiques_requetes() # Seulement si l'onglet Administration est affiché
+            self.actualiser_catalogue()
+        finally:
+            self.id_surveillance = self.root.after(self.INTERVALLE_SURVEILLANCE, self.surveiller_base)
+
+    def donnees_modifiees(self):
+        if self.current_user_role is not None:
+            self.rafraichir_listes()
+            self.rafraichir_journal_stock() # Rechargé seulement si l'onglet Journal est affiché
+
+    def catalogue_interface(self):
+        """
+        Catalogue affiché : celui de self.db en mémoire, tenu à jour par actualiser_catalogue
+        (lu directement dans la base seulement s'il n'a encore jamais été chargé).
+        """
+        if self.db.catalogue.charge:
+            return self.db.catalogue
+        return self.db.recuperer_catalogue()
+
+    def actualiser_catalogue(self):
+        """
+        Relit le catalogue hors de la boucle Tk si les données ont changé : PRAGMA data_version (lecture
+        en mémoire, sans accès aux tables) en base locale, génération du serveur pour une caisse cliente
+        (réponse vide si rien n'a changé). Le thread base de données renvoie les produits (sa connexion
+        ne les relit que si une autre a écrit : pas après ses propres ventes) et la boucle Tk les charge.
+        """
+        if self.lecture_catalogue_en_cours:
+            return # Une demande est déjà en route
+        catalogue = self.db.catalogue
+        if self.serveur:
+            fonction, args = "lire_catalogue", (catalogue.data_version if catalogue.charge else None,)
+        else:
+            version = self.db.version_donnees()
+            if catalogue.charge and version == catalogue.data_version:
+                return
+            fonction, args = (lambda db: (version, db.recuperer_produits())), ()
+        self.lecture_catalogue_en_cours = True
+        self.version_catalogue_demandee = catalogue.version
+        self.executeur.soumettre_db(fonction, *args, au_succes=self.fin_actualiser_catalogue,
+                                    a_erreur=self.erreur_actualiser_catalogue)
+
+    def fin_actualiser_catalogue(self, reponse):
+        self.lecture_catalogue_en_cours = False
+        if reponse is None:
+            return # Rien n'a changé sur le serveur
+        catalogue = self.db.catalogue
+        if catalogue.version != self.version_catalogue_demandee:
+            # Écriture de cette caisse pendant la lecture : la réponse peut l'ignorer, on relit
+            catalogue.data_version = None
+            self.actualiser_catalogue()
+            return
+        version, produits = reponse
+        catalogue.charger(produits, version)
+        if catalogue.version != self.version_catalogue_demandee:
+            self.donnees_modifiees()
+
+    def erreur_actualiser_catalogue(self, erreur):
+        # Pas de fenêtre d'erreur toutes les 2 secondes si le serveur est injoignable : nouvel essai au prochain sondage
+        self.lecture_catalogue_en_cours = False
+        print(f"Catalogue non actualisé : {erreur}")
+
+    def erreur_tache(self, erreur):
+        messagebox.showerror("Erreur", f"Une erreur est survenue pendant le traitement : {erreur}")
     
 
     # --- Connexion et RBAC ---
@@ -406,35 +2029,87 @@ class ApplicationEcommerce:
             
         self.root.geometry("800x600")
         self.root.resizable(True, True)
-        self.root.title(f"Application E-Commerce | Rôle: {role}")
+        self.root.title(f"Application E-Commerce | Rôle: {role} | Caisse: {self.db.caisse_id}")
+
+        self.label_occupe = ctk.CTkLabel(self.main_frame, text="", height=20)
+        self.label_occupe.pack(side="bottom", fill="x", padx=10)
 
-        self.tab_view = ctk.CTkTabview(self.main_frame)
+        # Les onglets sont construits et remplis à leur première sélection (voir preparer_onglet)
+        self.tab_view = ctk.CTkTabview(self.main_frame, command=self.changement_onglet)
         self.tab_view.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.tab_vendeur_frame = self.tab_view.add("Espace Vendeur (Caisse)")
-        self.setup_interface_vendeur(self.tab_vendeur_frame)
+        # {nom_onglet: (méthode de construction, méthode de rafraîchissement des données ou None)}
+        self.onglets = {self.ONGLET_VENDEUR: (self.setup_interface_vendeur, self.rafraichir_listes)}
+        self.onglets_construits = set()
+        self.onglets_a_rafraichir = set() # Onglets cachés dont les données ont changé
+        self.versions_affichees = {}
+        self.valeurs_combobox = {} # Les widgets sont recréés à chaque connexion
+
+        self.tab_vendeur_frame = self.tab_view.add(self.ONGLET_VENDEUR)
 
         if role == "Gérant":
-            self.tab_gerant_frame = self.tab_view.add("Espace Gérant (Stock)")
-            self.tab_historique_frame = self.tab_view.add("Historique des Ventes")
-            self.tab_journal_stock_frame = self.tab_view.add("Journal de Stock (Entrées)")
-            self.tab_admin_frame = self.tab_view.add("Administration") 
+            self.tab_gerant_frame = self.tab_view.add(self.ONGLET_GERANT)
+            self.tab_historique_frame = self.tab_view.add(self.ONGLET_HISTORIQUE)
+            self.tab_journal_stock_frame = self.tab_view.add(self.ONGLET_JOURNAL)
+            self.tab_admin_frame = self.tab_view.add(self.ONGLET_ADMIN) 
 
-            self.setup_interface_gerant(self.tab_gerant_frame)
-            self.setup_interface_historique(self.tab_historique_frame)
-            self.setup_interface_journal_stock(self.tab_journal_stock_frame)
-            self.setup_interface_administration(self.tab_admin_frame)
+            self.onglets[self.ONGLET_GERANT] = (self.setup_interface_gerant, self.rafraichir_listes)
+            self.onglets[self.ONGLET_HISTORIQUE] = (self.setup_interface_historique, None) # Chargé par sa construction
+            self.onglets[self.ONGLET_JOURNAL] = (self.setup_interface_journal_stock, self.rafraichir_journal_stock)
+            self.onglets[self.ONGLET_ADMIN] = (self.setup_interface_administration, self.rafraichir_statistiques_requetes)
 
-            self.tab_view.set("Espace Gérant (Stock)")
+            self.tab_view.set(self.ONGLET_GERANT)
         else:
-            self.tab_view.set("Espace Vendeur (Caisse)")
+            self.tab_view.set(self.ONGLET_VENDEUR)
+
+        self.changement_onglet()
 
-        self.rafraichir_listes() 
+    def changement_onglet(self):
+        """Appelé par le CTkTabview à chaque sélection d'onglet."""
+        self.preparer_onglet(self.tab_view.get())
+
+    def preparer_onglet(self, nom):
+        """
+        Construit l'onglet à sa première sélection puis charge ses données ;
+        un onglet déjà construit n'est rechargé que si ses données ont changé pendant qu'il était caché.
+        """
+        construction, rafraichissement = self.onglets[nom]
+        if nom not in self.onglets_construits:
+            self.onglets_construits.add(nom)
+            construction(self.tab_view.tab(nom))
+        elif nom not in self.onglets_a_rafraichir:
+            return
+        self.onglets_a_rafraichir.discard(nom)
+        if rafraichissement:
+            rafraichissement()
+
+    def onglet_visible(self, nom):
+        """
+        Indique si l'onglet est construit et affiché. Un onglet construit mais caché est marqué
+        à rafraîchir : ses données seront rechargées à sa prochaine sélection.
+        """
+        if nom not in getattr(self, 'onglets_construits', ()):
+            return False
+        if self.tab_view.get() == nom:
+            return True
+        self.onglets_a_rafraichir.add(nom)
+        return False
+
+    def onglet_a_redessiner(self, nom, version):
+        """Vrai si l'onglet est affiché et que ses widgets montrent une autre version du catalogue."""
+        if not self.onglet_visible(nom) or self.versions_affichees.get(nom) == version:
+            return False
+        self.versions_affichees[nom] = version
+        return True
         
     # --- Vues Spécifiques ---
 
     def setup_interface_gerant(self, tab_frame):
         self.produit_selectionne_id = None
+        self.quantite_chargee = None
+        # Correspondance produit_id -> item du Treeview (et valeurs affichées) pour le rafraîchissement incrémental
+        self.stock_items = {}
+        self.stock_valeurs = {}
 
         # --- A. FRAME MODIFICATION PRODUIT (AJOUT/MODIF/SUPPRESSION) ---
         input_frame = ctk.CTkFrame(tab_frame)
@@ -461,21 +2136,26 @@ class ApplicationEcommerce:
         self.entry_categorie = ctk.CTkEntry(input_frame, width=150)
         self.entry_categorie.grid(row=2, column=3, padx=10, pady=5, sticky="ew")
         self.entry_categorie.insert(0, "Général") # Valeur par défaut
+
+        # Code-barres (facultatif, unique) : saisi au clavier ou avec le scanner
+        ctk.CTkLabel(input_frame, text="Code-barres :").grid(row=3, column=0, padx=10, pady=5, sticky="w")
+        self.entry_code_barre = ctk.CTkEntry(input_frame, width=150)
+        self.entry_code_barre.grid(row=3, column=1, padx=10, pady=5, sticky="ew")
         
         btn_add = ctk.CTkButton(input_frame, text="➕ Ajouter un Nouveau", 
                                 command=self.action_ajouter_produit, 
                                 fg_color="#3B8EDC", hover_color="#36719F")
-        btn_add.grid(row=3, column=0, columnspan=2, pady=15, padx=10, sticky="ew")
+        btn_add.grid(row=4, column=0, columnspan=2, pady=15, padx=10, sticky="ew")
 
         btn_modify = ctk.CTkButton(input_frame, text="✏️ Modifier la Sélection (Total)", 
                                 command=self.action_modifier_produit,
                                 fg_color="#F39C12", hover_color="#D68910")
-        btn_modify.grid(row=3, column=2, pady=15, padx=10, sticky="ew")
+        btn_modify.grid(row=4, column=2, pady=15, padx=10, sticky="ew")
         
         btn_delete = ctk.CTkButton(input_frame, text="🗑️ Supprimer la Sélection", 
                                 command=self.action_supprimer_produit,
                                 fg_color="#C0392B", hover_color="#A93226")
-        btn_delete.grid(row=3, column=3, pady=15, padx=10, sticky="ew")
+        btn_delete.grid(row=4, column=3, pady=15, padx=10, sticky="ew")
         
         input_frame.grid_columnconfigure((1, 3), weight=1)
 
@@ -488,6 +2168,9 @@ class ApplicationEcommerce:
 
         ctk.CTkLabel(replenishment_frame, text="RÉCEPTION DE STOCK (Ajout d'unités au stock actuel)", font=("Arial", 16, "bold")).grid(row=0, column=0, columnspan=4, pady=10)
         
+        # Lignes de la réception en cours {produit_id: quantite}, enregistrées ensemble à la validation
+        self.reception = {}
+
         ctk.CTkLabel(replenishment_frame, text="Article :").grid(row=1, column=0, padx=10, pady=5, sticky="w")
         self.combo_replenish_product = ctk.CTkComboBox(replenishment_frame, values=["Chargement..."], width=250)
         self.combo_replenish_product.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
@@ -497,10 +2180,38 @@ class ApplicationEcommerce:
         self.entry_replenish_qty.grid(row=1, column=3, padx=10, pady=5, sticky="ew")
         self.entry_replenish_qty.insert(0, "1")
 
-        btn_replenish = ctk.CTkButton(replenishment_frame, text="🚚 Valider l'Entrée de Stock", 
-                                command=self.action_entree_stock, 
+        # Scanner : chaque code lu ajoute 1 unité à la réception
+        ctk.CTkLabel(replenishment_frame, text="Code-barres :").grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        self.entry_scan_reception = ctk.CTkEntry(replenishment_frame, width=250, placeholder_text="Scanner un article reçu...")
+        self.entry_scan_reception.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+        self.entry_scan_reception.bind("<Return>", self.action_scanner_reception)
+
+        btn_add_line = ctk.CTkButton(replenishment_frame, text="➕ Ajouter à la Réception", 
+                                command=self.action_ajouter_ligne_reception, 
+                                fg_color="#3B8EDC", hover_color="#36719F")
+        btn_add_line.grid(row=2, column=2, columnspan=2, pady=5, padx=10, sticky="ew")
+
+        self.tree_reception = ttk.Treeview(replenishment_frame, columns=("ID", "Nom", "Qté"), show='headings', height=5)
+        self.tree_reception.heading("ID", text="ID", anchor="center")
+        self.tree_reception.heading("Nom", text="Article", anchor="center")
+        self.tree_reception.heading("Qté", text="Quantité Reçue", anchor="center")
+        self.tree_reception.column("ID", width=50, stretch=tk.NO)
+        self.tree_reception.column("Nom", width=250, stretch=tk.YES)
+        self.tree_reception.column("Qté", width=120, stretch=tk.NO)
+        self.tree_reception.grid(row=3, column=0, columnspan=4, padx=10, pady=5, sticky="ew")
+
+        self.label_reception = ctk.CTkLabel(replenishment_frame, text="Réception : 0 ligne(s)")
+        self.label_reception.grid(row=4, column=0, columnspan=4, padx=10, pady=(0, 5))
+
+        btn_remove_line = ctk.CTkButton(replenishment_frame, text="🗑️ Retirer la Ligne", 
+                                command=self.action_retirer_ligne_reception,
+                                fg_color="#C0392B", hover_color="#A93226")
+        btn_remove_line.grid(row=5, column=0, columnspan=2, pady=15, padx=10, sticky="ew")
+
+        btn_replenish = ctk.CTkButton(replenishment_frame, text="🚚 Valider la Réception", 
+                                command=self.action_valider_reception, 
                                 fg_color="#1E8449", hover_color="#145A32")
-        btn_replenish.grid(row=2, column=0, columnspan=4, pady=15, padx=10, sticky="ew")
+        btn_replenish.grid(row=5, column=2, columnspan=2, pady=15, padx=10, sticky="ew")
         
         replenishment_frame.grid_columnconfigure(1, weight=1)
 
@@ -512,19 +2223,21 @@ class ApplicationEcommerce:
         tree_frame.pack(pady=10, padx=20, fill="both", expand=True)
 
         # MODIF: Ajout de la colonne Catégorie
-        self.tree_stock = ttk.Treeview(tree_frame, columns=("ID", "Nom", "Catégorie", "Prix", "Qté"), show='headings')
+        self.tree_stock = ttk.Treeview(tree_frame, columns=("ID", "Nom", "Catégorie", "Prix", "Qté", "Code"), show='headings')
         self.tree_stock.heading("ID", text="ID", anchor="center")
         self.tree_stock.heading("Nom", text="Nom", anchor="center")
         self.tree_stock.heading("Catégorie", text="Catégorie", anchor="center") # NOUVEAU
         # LIBELLÉ PRIX EN CDF
         self.tree_stock.heading("Prix", text="Prix (FC)", anchor="center") 
         self.tree_stock.heading("Qté", text="Quantité", anchor="center")
+        self.tree_stock.heading("Code", text="Code-barres", anchor="center")
         
         self.tree_stock.column("ID", width=50, stretch=tk.NO)
         self.tree_stock.column("Nom", width=150, stretch=tk.YES)
         self.tree_stock.column("Catégorie", width=100, stretch=tk.NO) # NOUVEAU
         self.tree_stock.column("Prix", width=80, stretch=tk.NO)
         self.tree_stock.column("Qté", width=80, stretch=tk.NO)
+        self.tree_stock.column("Code", width=120, stretch=tk.NO)
         
         self.tree_stock.pack(side="left", fill="both", expand=True)
 
@@ -534,7 +2247,7 @@ class ApplicationEcommerce:
         
         self.tree_stock.bind('<<TreeviewSelect>>', self.selectionner_produit)
 
-    def action_entree_stock(self):
+    def action_ajouter_ligne_reception(self):
         try:
             selection_complete = self.combo_replenish_product.get()
             
@@ -549,23 +2262,62 @@ class ApplicationEcommerce:
             if qty_ajoutee <= 0:
                 messagebox.showwarning("Attention", "La quantité ajoutée doit être positive.")
                 return
-            
-            success, message = self.db.enregistrer_entree_stock(prod_id, qty_ajoutee)
-            
-            if success:
-                messagebox.showinfo("Succès", message)
-                self.entry_replenish_qty.delete(0, tk.END)
-                self.entry_replenish_qty.insert(0, "1")
-                self.rafraichir_listes() 
-                if hasattr(self, 'tree_journal_stock'):
-                    self.rafraichir_journal_stock() 
-            else:
-                messagebox.showerror("Erreur", message)
+
+            self.ajouter_a_reception(prod_id, qty_ajoutee)
+            self.entry_replenish_qty.delete(0, tk.END)
+            self.entry_replenish_qty.insert(0, "1")
 
         except ValueError:
             messagebox.showerror("Erreur", "Veuillez entrer une quantité valide.")
-        except Exception:
-             messagebox.showerror("Erreur", "Impossible de valider l'entrée de stock.")
+
+    def action_scanner_reception(self, event=None):
+        code = self.entry_scan_reception.get().strip()
+        self.entry_scan_reception.delete(0, tk.END)
+        if not code:
+            return
+        produit = self.db.trouver_par_code(code)
+        if produit is None:
+            self.label_reception.configure(text=f"❌ Code inconnu : {code}")
+            return
+        self.ajouter_a_reception(produit[0], 1)
+
+    def ajouter_a_reception(self, prod_id, quantite):
+        """Cumule la quantité sur la ligne du produit (seule cette ligne du Treeview est mise à jour)."""
+        self.reception[prod_id] = self.reception.get(prod_id, 0) + quantite
+        nom = self.produits_details.get(prod_id, {}).get('nom', prod_id)
+        valeurs = (prod_id, nom, self.reception[prod_id])
+        if self.tree_reception.exists(str(prod_id)):
+            self.tree_reception.item(str(prod_id), values=valeurs)
+        else:
+            self.tree_reception.insert("", tk.END, iid=str(prod_id), values=valeurs)
+        self.maj_label_reception()
+
+    def maj_label_reception(self):
+        self.label_reception.configure(
+            text=f"Réception : {len(self.reception)} ligne(s), {sum(self.reception.values())} unité(s)")
+
+    def action_retirer_ligne_reception(self):
+        for item in self.tree_reception.selection():
+            self.reception.pop(int(item), None)
+            self.tree_reception.delete(item)
+        self.maj_label_reception()
+
+    def action_valider_reception(self):
+        if not self.reception:
+            messagebox.showwarning("Réception vide", "Ajoutez des articles à la réception avant de la valider.")
+            return
+
+        # Toutes les lignes en une transaction : un seul message et un seul rafraîchissement
+        success, message = self.db.enregistrer_reception(list(self.reception.items()))
+        if success:
+            messagebox.showinfo("Succès", message)
+            self.reception.clear()
+            self.tree_reception.delete(*self.tree_reception.get_children())
+            self.maj_label_reception()
+            self.rafraichir_listes() 
+            self.rafraichir_journal_stock() # Rechargé seulement si l'onglet Journal est affiché
+        else:
+            messagebox.showerror("Erreur", message)
         
     def setup_interface_vendeur(self, tab_frame):
         # AJOUT: Nouvelle frame pour le filtre de catégorie
@@ -588,22 +2340,45 @@ class ApplicationEcommerce:
 
         ctk.CTkLabel(add_frame, text="AJOUTER UN ARTICLE AU PANIER", font=("Arial", 16, "bold")).grid(row=0, column=0, columnspan=4, pady=(5, 10))
 
-        # 1. Combobox de sélection de produit
-        ctk.CTkLabel(add_frame, text="Produit :").grid(row=1, column=0, padx=10, pady=5, sticky="w")
-        self.combobox_produits = ctk.CTkComboBox(add_frame, values=["Veuillez ajouter des produits"], width=300)
-        self.combobox_produits.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        # 0. Saisie du scanner : le scanner tape le code puis Entrée, chaque scan ajoute 1 unité
+        ctk.CTkLabel(add_frame, text="Code-barres :").grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.entry_scan = ctk.CTkEntry(add_frame, width=300, placeholder_text="Scanner un article...")
+        self.entry_scan.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        self.entry_scan.bind("<Return>", self.action_scanner_code)
+        self.label_scan = ctk.CTkLabel(add_frame, text="")
+        self.label_scan.grid(row=1, column=2, columnspan=2, padx=10, pady=5, sticky="w")
+
+        # 1. Recherche de produit (résultats mis à jour à chaque frappe)
+        ctk.CTkLabel(add_frame, text="Rechercher :").grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        self.entry_recherche_produit = ctk.CTkEntry(add_frame, width=300, placeholder_text="Nom ou catégorie du produit...")
+        self.entry_recherche_produit.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+        self.entry_recherche_produit.bind("<KeyRelease>", self.action_rechercher_produit)
+        self.entry_recherche_produit.bind("<Return>", lambda event: self.action_ajouter_au_panier())
 
         # 2. Champ Quantité
-        ctk.CTkLabel(add_frame, text="Quantité :").grid(row=1, column=2, padx=10, pady=5, sticky="w")
+        ctk.CTkLabel(add_frame, text="Quantité :").grid(row=2, column=2, padx=10, pady=5, sticky="w")
         self.entry_vente_qty = ctk.CTkEntry(add_frame, width=80)
-        self.entry_vente_qty.grid(row=1, column=3, padx=10, pady=5, sticky="ew")
+        self.entry_vente_qty.grid(row=2, column=3, padx=10, pady=5, sticky="ew")
         self.entry_vente_qty.insert(0, "1")
 
+        # Résultats de la recherche (l'iid de chaque ligne est l'id du produit)
+        self.tree_resultats = ttk.Treeview(add_frame, columns=("ID", "Nom", "Prix", "Stock"), show='headings', height=5)
+        self.tree_resultats.heading("ID", text="ID", anchor="center")
+        self.tree_resultats.heading("Nom", text="Produit", anchor="center")
+        self.tree_resultats.heading("Prix", text="Prix (FC)", anchor="center")
+        self.tree_resultats.heading("Stock", text="En stock", anchor="center")
+        self.tree_resultats.column("ID", width=50, stretch=tk.NO)
+        self.tree_resultats.column("Nom", width=250, stretch=tk.YES)
+        self.tree_resultats.column("Prix", width=100, stretch=tk.NO)
+        self.tree_resultats.column("Stock", width=80, stretch=tk.NO)
+        self.tree_resultats.grid(row=3, column=0, columnspan=4, padx=10, pady=5, sticky="ew")
+        self.tree_resultats.bind("<Double-1>", lambda event: self.action_ajouter_au_panier())
+
         # 3. Bouton Ajouter
         btn_add_to_cart = ctk.CTkButton(add_frame, text="🛒 Ajouter au Panier", 
                                         fg_color="#3B8EDC", hover_color="#36719F",
                                         command=self.action_ajouter_au_panier)
-        btn_add_to_cart.grid(row=2, column=0, columnspan=4, pady=10, padx=10, sticky="ew")
+        btn_add_to_cart.grid(row=4, column=0, columnspan=4, pady=10, padx=10, sticky="ew")
         
         add_frame.grid_columnconfigure(1, weight=1)
         add_frame.grid_columnconfigure(3, weight=0) 
@@ -647,16 +2422,17 @@ class ApplicationEcommerce:
                                    fg_color="#C0392B", hover_color="#A93226")
         btn_remove.pack(side="left", padx=10, fill="x", expand=True)
 
-        btn_checkout = ctk.CTkButton(btn_frame, text="✅ Valider la Vente (Paiement)", 
+        self.btn_checkout = ctk.CTkButton(btn_frame, text="✅ Valider la Vente (Paiement)", 
                                      command=self.action_valider_panier,
                                      fg_color="#2ECC71", hover_color="#27AE60")
-        btn_checkout.pack(side="right", padx=10, fill="x", expand=True)
+        self.btn_checkout.pack(side="right", padx=10, fill="x", expand=True)
 
     def action_selectionner_categorie(self, new_category):
         """Mise à jour du filtre de catégorie et rafraîchissement des produits de vente."""
         # NOUVELLE MÉTHODE
         self.current_category_filter = new_category
-        self.rafraichir_listes() # Rafraîchissement qui va appliquer le filtre au combobox_produits
+        self.versions_affichees.pop(self.ONGLET_VENDEUR, None) # Liste à refiltrer même sans changement du catalogue
+        self.rafraichir_listes() # Rafraîchissement qui va appliquer le filtre aux résultats de recherche
 
     def action_ajouter_produit(self):
         try:
@@ -666,14 +2442,18 @@ class ApplicationEcommerce:
             categorie = self.entry_categorie.get().strip() # NOUVEAU
             if not categorie: categorie = "Général"
             
-            self.db.ajouter_produit(nom, prix, qty, categorie) # MODIF: Passage de catégorie
-            messagebox.showinfo("Succès", "Produit ajouté !")
+            success, message = self.db.ajouter_produit(nom, prix, qty, categorie, self.entry_code_barre.get()) # MODIF: Passage de catégorie
+            if not success:
+                messagebox.showerror("Erreur", message)
+                return
+            messagebox.showinfo("Succès", message)
             self.rafraichir_listes()
             self.entry_nom.delete(0, tk.END)
             self.entry_prix.delete(0, tk.END)
             self.entry_qty.delete(0, tk.END)
             self.entry_categorie.delete(0, tk.END) # NOUVEAU
             self.entry_categorie.insert(0, "Général")
+            self.entry_code_barre.delete(0, tk.END)
 
         except ValueError:
             messagebox.showerror("Erreur", "Vérifiez que le prix et la quantité sont des nombres.")
@@ -685,11 +2465,12 @@ class ApplicationEcommerce:
             values = self.tree_stock.item(selected_item, 'values')
             self.produit_selectionne_id = int(values[0])
             
-            # values: (ID, Nom, Catégorie, Prix, Qté)
+            # values: (ID, Nom, Catégorie, Prix, Qté, Code-barres)
             nom = values[1]
             categorie = values[2] # Nouvel index
             prix = values[3] 
             qty = values[4] 
+            code_barre = values[5] if len(values) > 5 else ""
             
             self.entry_nom.delete(0, tk.END)
             self.entry_nom.insert(0, nom)
@@ -698,8 +2479,11 @@ class ApplicationEcommerce:
             self.entry_prix.insert(0, str(prix).replace(' FC', '').replace(',', '.')) 
             self.entry_qty.delete(0, tk.END)
             self.entry_qty.insert(0, qty)
+            self.quantite_chargee = int(qty) # Stock de référence : la modification est refusée s'il a changé
             self.entry_categorie.delete(0, tk.END) # NOUVEAU
             self.entry_categorie.insert(0, categorie) # NOUVEAU
+            self.entry_code_barre.delete(0, tk.END)
+            self.entry_code_barre.insert(0, code_barre)
 
     def action_modifier_produit(self):
         if not hasattr(self, 'produit_selectionne_id') or self.produit_selectionne_id is None:
@@ -719,14 +2503,20 @@ class ApplicationEcommerce:
                 messagebox.showerror("Erreur", "Veuillez remplir tous les champs correctement.")
                 return 
                 
-            self.db.modifier_produit(prod_id, nom, prix, qty, categorie) # MODIF: Passage de catégorie
-            messagebox.showinfo("Succès", f"Produit ID {prod_id} modifié avec succès (Stock Total mis à jour).")
+            success, message = self.db.modifier_produit(prod_id, nom, prix, qty, categorie, self.entry_code_barre.get(),
+                                                        quantite_chargee=self.quantite_chargee) # MODIF: Passage de catégorie
+            if not success:
+                messagebox.showerror("Erreur", message)
+                self.rafraichir_listes() # Affiche le stock actuel pour une nouvelle sélection
+                return
+            messagebox.showinfo("Succès", message)
             self.produit_selectionne_id = None
             self.entry_nom.delete(0, tk.END)
             self.entry_prix.delete(0, tk.END)
             self.entry_qty.delete(0, tk.END)
             self.entry_categorie.delete(0, tk.END) # NOUVEAU
             self.entry_categorie.insert(0, "Général")
+            self.entry_code_barre.delete(0, tk.END)
             self.rafraichir_listes()
             
         except ValueError:
@@ -753,92 +2543,100 @@ class ApplicationEcommerce:
             self.entry_qty.delete(0, tk.END)
             self.entry_categorie.delete(0, tk.END) # NOUVEAU
             self.entry_categorie.insert(0, "Général")
+            self.entry_code_barre.delete(0, tk.END)
             self.rafraichir_listes()
             
     def rafraichir_listes(self):
         """
         Rafraîchit l'affichage du stock (Gérant), les comboboxes (Gérant/Vendeur) et le panier.
         Le filtre de catégorie est appliqué ici pour la liste de vente.
+        Rafraîchissement incrémental : seuls les éléments dont les données ont changé
+        sont mis à jour dans les widgets, et rien n'est redessiné si la version du catalogue
+        n'a pas changé. Les widgets des onglets cachés ne sont pas touchés :
+        l'onglet est marqué et mis à jour à sa prochaine sélection.
         """
-        # 1. Récupérer TOUS les produits pour la gestion du stock et les détails
-        produits = self.db.recuperer_produits() 
-        
-        # 2. Mise à jour de self.produits_details (pour le panier)
-        self.produits_details.clear()
-        
-        # Effacer les Treeviews
-        if hasattr(self, 'tree_stock'):
-            for row in self.tree_stock.get_children():
-                self.tree_stock.delete(row)
-        
-        # Préparation des comboboxes
-        produits_vendeur_combobox_values = ["AUCUN PRODUIT DISPONIBLE"]
-        produits_replenish_combobox_values = ["AUCUN PRODUIT"]
-        
-        # Liste pour le ComboBox Vendeur (filtrée par catégorie)
-        produits_vendeur_liste = []
+        # 1. Catalogue des produits (relu en arrière-plan si une autre connexion a écrit)
+        self.actualiser_catalogue()
+        catalogue = self.catalogue_interface()
         
-        # 3. Remplissage des données
-        for produit in produits:
-            # produit = (id, nom, prix, quantite, categorie)
-            prod_id, nom, prix, quantite, categorie = produit 
-            
-            # Mise à jour du détail pour le panier (Vendeur)
-            self.produits_details[prod_id] = {
-                'nom': nom, 
-                'prix': prix, 
-                'stock': quantite,
-                'categorie': categorie # NOUVEAU
+        # 2. Mise à jour de self.produits_details (pour le panier), uniquement si le catalogue a changé
+        if catalogue.version != self.version_produits_details:
+            self.produits_details = {
+                prod_id: {'nom': nom, 'prix': prix, 'stock': quantite, 'categorie': categorie}
+                for prod_id, nom, prix, quantite, categorie, code_barre in catalogue.produits.values()
             }
-            
-            # Mise à jour de l'affichage Gérant (Treeview Stock)
-            if hasattr(self, 'tree_stock'):
-                # MODIF: Ajouter la catégorie
-                self.tree_stock.insert("", tk.END, values=(prod_id, nom, categorie, f"{prix:.0f} FC", quantite)) 
-
-            # Remplissage du ComboBox de Réception de Stock (Gérant)
-            produits_replenish_combobox_values.append(f"{prod_id} | {nom}")
-
-            # Remplissage de la liste Vendeur (application du filtre de catégorie)
-            if self.current_category_filter == "Toutes les catégories" or categorie == self.current_category_filter:
-                produits_vendeur_liste.append(f"{prod_id} | {nom} ({quantite} en stock)")
-        
-        # Remplissage du ComboBox Réception de Stock (Gérant)
-        if hasattr(self, 'combo_replenish_product'):
-            if len(produits_replenish_combobox_values) > 1:
-                self.combo_replenish_product.configure(values=produits_replenish_combobox_values[1:])
-                self.combo_replenish_product.set(produits_replenish_combobox_values[1])
-            else:
-                self.combo_replenish_product.configure(values=["AUCUN PRODUIT"])
-                self.combo_replenish_product.set("AUCUN PRODUIT")
-
-        # Remplissage du ComboBox Vendeur (Caisse)
-        if hasattr(self, 'combobox_produits'):
-            if produits_vendeur_liste:
-                self.combobox_produits.configure(values=produits_vendeur_liste)
-                self.combobox_produits.set(produits_vendeur_liste[0])
-            else:
-                self.combobox_produits.configure(values=produits_vendeur_combobox_values)
-                self.combobox_produits.set(produits_vendeur_combobox_values[0])
-                
-        # 4. Mise à jour des catégories (pour le ComboBox Catégories Vendeur)
-        if hasattr(self, 'combo_category_filter'):
-            categories = ["Toutes les catégories"] + self.db.recuperer_categories()
-            self.combo_category_filter.configure(values=categories)
-            if self.current_category_filter in categories:
-                self.combo_category_filter.set(self.current_category_filter)
-            else:
+            self.version_produits_details = catalogue.version
+
+        # 3. Affichage Gérant (Treeview Stock par différence et ComboBox Réception de Stock)
+        if self.onglet_a_redessiner(self.ONGLET_GERANT, catalogue.version):
+            produits = catalogue.liste()
+            self.rafraichir_tree_stock(produits)
+            self.maj_combobox(self.combo_replenish_product,
+                              [f"{prod_id} | {nom}" for prod_id, nom, *_ in produits], "AUCUN PRODUIT")
+
+        # 4. Affichage Vendeur : catégories et résultats de recherche (filtrés par catégorie)
+        if self.onglet_a_redessiner(self.ONGLET_VENDEUR, catalogue.version):
+            categories = ["Toutes les catégories"] + catalogue.categories()
+            if self.current_category_filter not in categories:
                 self.current_category_filter = "Toutes les catégories"
-                self.combo_category_filter.set("Toutes les catégories")
-
+            self.action_rechercher_produit()
+            self.maj_combobox(self.combo_category_filter, categories, "Toutes les catégories")
+            self.combo_category_filter.set(self.current_category_filter)
 
         # 5. Rafraîchir le panier 
         if self.current_user_role in ("Vendeur", "Gérant"):
             self.rafraichir_panier_display()
 
-        # 6. Rafraîchir le journal de stock si l'onglet est visible
-        if hasattr(self, 'tree_journal_stock'):
-            self.rafraichir_journal_stock() 
+    def action_rechercher_produit(self, event=None):
+        """Affiche les meilleurs résultats pour le texte saisi (index de recherche en mémoire)."""
+        filtre = None if self.current_category_filter == "Toutes les catégories" else self.current_category_filter
+        resultats = self.catalogue_interface().rechercher(self.entry_recherche_produit.get(), filtre,
+                                                         self.NB_RESULTATS_RECHERCHE)
+        selection = self.tree_resultats.selection()
+
+        self.tree_resultats.delete(*self.tree_resultats.get_children())
+        for prod_id, nom, prix, quantite, categorie, code_barre in resultats:
+            self.tree_resultats.insert("", tk.END, iid=str(prod_id), values=(prod_id, nom, f"{prix:.0f}", quantite))
+
+        # Sélection conservée si le produit est toujours proposé, sinon premier résultat
+        if selection and self.tree_resultats.exists(selection[0]):
+            self.tree_resultats.selection_set(selection[0])
+        elif resultats:
+            self.tree_resultats.selection_set(str(resultats[0][0]))
+
+    def rafraichir_tree_stock(self, produits):
+        """
+        Met à jour tree_stock par différence avec l'affichage précédent :
+        seules les lignes modifiées, ajoutées ou supprimées touchent le widget.
+        """
+        vus = set()
+        for prod_id, nom, prix, quantite, categorie, code_barre in produits:
+            vus.add(prod_id)
+            valeurs = (prod_id, nom, categorie, f"{prix:.0f} FC", quantite, code_barre or "")
+            item_id = self.stock_items.get(prod_id)
+            if item_id is None:
+                self.stock_items[prod_id] = self.tree_stock.insert("", tk.END, values=valeurs)
+            elif self.stock_valeurs.get(prod_id) != valeurs:
+                self.tree_stock.item(item_id, values=valeurs)
+            self.stock_valeurs[prod_id] = valeurs
+
+        # Produits supprimés depuis le dernier rafraîchissement
+        for prod_id in [pid for pid in self.stock_items if pid not in vus]:
+            self.tree_stock.delete(self.stock_items.pop(prod_id))
+            self.stock_valeurs.pop(prod_id, None)
+
+    def maj_combobox(self, combobox, valeurs, valeur_vide):
+        """Reconfigure un combobox uniquement si sa liste a changé (la sélection valide est conservée)."""
+        valeurs = valeurs or [valeur_vide]
+        if self.valeurs_combobox.get(str(combobox)) == valeurs:
+            return
+        self.valeurs_combobox[str(combobox)] = valeurs
+        selection = combobox.get()
+        combobox.configure(values=valeurs)
+        if selection not in valeurs:
+            # Même produit avec un libellé mis à jour (ex. stock) : on garde la sélection
+            prefixe = selection.split(' | ')[0] + ' | '
+            combobox.set(next((v for v in valeurs if v.startswith(prefixe)), valeurs[0]))
 
     def rafraichir_panier_display(self): 
         """Mise à jour du Treeview du panier et du total."""
@@ -871,7 +2669,7 @@ class ApplicationEcommerce:
                 total_cdf = prix_u * qte_panier
                 total_general_cdf += total_cdf
                 
-                self.tree_panier.insert("", tk.END, values=(
+                self.tree_panier.insert("", tk.END, iid=str(prod_id), values=(
                     prod_id, 
                     details['nom'], 
                     qte_panier, 
@@ -888,15 +2686,57 @@ class ApplicationEcommerce:
 
         self.panier_total_label.configure(text=f"TOTAL GÉNÉRAL : {total_general_cdf:.0f} FC")
     
+    def action_scanner_code(self, event=None):
+        """
+        Ajoute au panier l'article scanné. Pas de boîte de dialogue (elle bloquerait les scans suivants) :
+        le résultat s'affiche dans label_scan et seule la ligne du panier concernée est mise à jour.
+        """
+        code = self.entry_scan.get().strip()
+        self.entry_scan.delete(0, tk.END)
+        if not code:
+            return
+
+        produit = self.db.trouver_par_code(code)
+        if produit is None:
+            self.label_scan.configure(text=f"❌ Code inconnu : {code}", text_color="#C0392B")
+            return
+
+        prod_id, nom, prix, quantite, categorie, code_barre = produit
+        qte_deja_panier = self.panier.get(prod_id, 0)
+        if qte_deja_panier + 1 > quantite:
+            self.label_scan.configure(text=f"⚠️ Stock insuffisant : {nom} ({quantite} en stock)", text_color="#F39C12")
+            return
+
+        # Détails à jour pour le panier (le produit vient d'être relu dans la base)
+        self.produits_details[prod_id] = {'nom': nom, 'prix': prix, 'stock': quantite, 'categorie': categorie}
+        self.panier[prod_id] = qte_deja_panier + 1
+        self.maj_ligne_panier(prod_id)
+        self.label_scan.configure(text=f"✅ {nom} (x{self.panier[prod_id]})", text_color="#1E8449")
+
+    def maj_ligne_panier(self, prod_id):
+        """Met à jour la seule ligne prod_id du panier (et le total) sans reconstruire le Treeview."""
+        details = self.produits_details[prod_id]
+        qte_panier = self.panier[prod_id]
+        valeurs = (prod_id, details['nom'], qte_panier, f"{details['prix']:.0f}", f"{details['prix'] * qte_panier:.0f}")
+        if self.tree_panier.exists(str(prod_id)):
+            self.tree_panier.item(str(prod_id), values=valeurs)
+        else:
+            self.tree_panier.insert("", tk.END, iid=str(prod_id), values=valeurs, tags=(prod_id,))
+        self.maj_total_panier()
+
+    def maj_total_panier(self):
+        total_general_cdf = sum(self.produits_details[pid]['prix'] * qte
+                                for pid, qte in self.panier.items() if pid in self.produits_details)
+        self.panier_total_label.configure(text=f"TOTAL GÉNÉRAL : {total_general_cdf:.0f} FC")
+
     def action_ajouter_au_panier(self):
         try:
-            selection_complete = self.combobox_produits.get()
-            if "AUCUN PRODUIT" in selection_complete:
+            selection = self.tree_resultats.selection()
+            if not selection:
                 messagebox.showwarning("Erreur", "Aucun produit sélectionné.")
                 return 
 
-            prod_id_str = selection_complete.split(' | ')[0]
-            prod_id = int(prod_id_str)
+            prod_id = int(selection[0]) # iid de la ligne = id du produit
             qty_add = int(self.entry_vente_qty.get())
 
             if qty_add <= 0:
@@ -950,51 +2790,112 @@ class ApplicationEcommerce:
         if not confirmation:
             return
 
-        ventes_reussies = 0
-        ventes_echouees = 0
-        
-        # Créer une copie car le stock peut changer pendant l'itération
-        panier_copy = self.panier.copy() 
-        
-        for prod_id, quantite in panier_copy.items():
-            success, message = self.db.faire_une_vente(prod_id, quantite)
-            if success:
-                ventes_reussies += 1
-            else:
-                ventes_echouees += 1 
-                
-        # Après la transaction, vider le panier en mémoire
-        self.panier.clear()
-        
-        if ventes_reussies > 0:
-            messagebox.showinfo("Vente Réussie", f"{ventes_reussies} article(s) vendu(s) avec succès. {ventes_echouees} échec(s).")
-            self.rafraichir_listes() # Rafraîchit le stock affiché, le combobox et le panier
-        elif ventes_echouees > 0: 
-            # Ce cas arrive si la première vente a échoué
-            messagebox.showerror("Erreur de Transaction", "Aucune vente n'a pu être complétée. Veuillez vérifier les stocks et recommencer.")
+        # Vente de tout le panier en une seule transaction (tout ou rien), sur le thread base de données
+        self.btn_checkout.configure(state="disabled")
+        self.executeur.soumettre_db("faire_vente_panier", dict(self.panier),
+                                    au_succes=self.fin_valider_panier,
+                                    a_erreur=self.erreur_valider_panier)
+
+    def erreur_valider_panier(self, erreur):
+        self.btn_checkout.configure(state="normal")
+        self.erreur_tache(erreur)
+
+    def fin_valider_panier(self, resultat):
+        self.btn_checkout.configure(state="normal")
+        succes, resultats = resultat
+
+        if succes:
+            # Après la transaction, retirer du panier les quantités vendues
+            # (des articles ont pu être ajoutés pendant l'enregistrement)
+            for pid, qte, ok, message in resultats:
+                self.db.catalogue.ajuster_quantite(pid, -qte) # Stock affiché sans attendre la relecture
+                reste = self.panier.get(pid, 0) - qte
+                if reste > 0:
+                    self.panier[pid] = reste
+                else:
+                    self.panier.pop(pid, None)
+            messagebox.showinfo("Vente Réussie", f"{len(resultats)} article(s) vendu(s) avec succès.")
         else:
-            # Ce cas est un garde-fou
-            messagebox.showwarning("Attention", "Aucun article dans le panier après vérification.")
+            # Le panier est conservé : le rafraîchissement ajustera les quantités au stock réel
+            erreurs = [f"- {self.produits_details.get(pid, {}).get('nom', pid)} : {message}"
+                       for pid, qte, ok, message in resultats if not message.startswith("Annulée")]
+            messagebox.showerror("Erreur de Transaction",
+                                 "Aucune vente n'a été enregistrée. Veuillez vérifier les stocks et recommencer.\n"
+                                 + "\n".join(erreurs))
+
+        self.rafraichir_listes() # Rafraîchit le stock affiché, le combobox et le panier
 
     def action_filtrer_ventes(self):
-        date_debut = self.entry_date_debut.get()
-        date_fin = self.entry_date_fin.get()
+        """Relance l'affichage paginé de l'historique avec les filtres de dates saisis."""
+        self.historique_filtre = (self.entry_date_debut.get(), self.entry_date_fin.get())
+        self.historique_curseur = None # Clé (date_vente, id) de la dernière ligne affichée
+        self.historique_complet = False
+        self.historique_page_prevue = False
+        # Les résultats d'un filtre précédent encore en cours seront ignorés
+        self.historique_generation = getattr(self, 'historique_generation', 0) + 1
         
         for row in self.tree_historique.get_children():
             self.tree_historique.delete(row)
+        self.tree_historique.yview_moveto(0)
+        self.label_total_historique.configure(text="TOTAL VENTES : ...")
+
+        self.charger_page_historique()
+
+        # Total calculé par un agrégat SQL (indépendant du nombre de lignes affichées)
+        generation = self.historique_generation
+        self.executeur.soumettre_db("calculer_total_ventes", *self.historique_filtre,
+                                    au_succes=lambda total: self.afficher_total_historique(total, generation))
+
+    def afficher_total_historique(self, total, generation):
+        if generation != self.historique_generation:
+            return
+        nb_ventes, total_general = total
+        self.label_total_historique.configure(text=f"TOTAL VENTES : {total_general:.0f} FC ({nb_ventes} vente(s))")
+
+    def charger_page_historique(self):
+        """Demande la page suivante de l'historique au thread base de données."""
+        if self.historique_complet or getattr(self, 'historique_page_en_cours', False):
+            self.historique_page_prevue = False
+            return
+
+        self.historique_page_en_cours = True
+        generation = self.historique_generation
+        self.executeur.soumettre_db("recuperer_ventes_page", *self.historique_filtre,
+                                    apres=self.historique_curseur, limite=self.TAILLE_PAGE_HISTORIQUE,
+                                    au_succes=lambda ventes: self.afficher_page_historique(ventes, generation),
+                                    a_erreur=self.erreur_page_historique)
+
+    def erreur_page_historique(self, erreur):
+        # Sans cela, plus aucune page ne serait demandée (chargement considéré comme toujours en cours)
+        self.historique_page_en_cours = False
+        self.historique_page_prevue = False
+        self.erreur_tache(erreur)
+
+    def afficher_page_historique(self, ventes, generation):
+        """Ajoute une page de l'historique à la fin du Treeview."""
+        self.historique_page_en_cours = False
+        self.historique_page_prevue = False
+        if generation != self.historique_generation:
+            # Filtre modifié entre-temps : on recharge la première page du nouveau filtre
+            self.charger_page_historique()
+            return
 
-        ventes = self.db.recuperer_ventes(date_debut, date_fin)
-        total_general = 0
-        
         for vente in ventes:
-            # vente = (date_vente, nom_produit, quantite, prix_unitaire_cdf, total_vente_cdf)
+            # vente = (id_vente, date_vente, nom_produit, quantite, prix_unitaire_cdf, total_vente_cdf)
             # Affichage en CDF
-            self.tree_historique.insert("", tk.END, values=(vente[0], vente[1], vente[2], f"{vente[3]:.0f}", f"{vente[4]:.0f}"))
-            total_general += vente[4]
-            
-        # Affichage du total en CDF
-        self.tree_historique.insert("", tk.END, values=("", "", "", "TOTAL VENTES :", f"{total_general:.0f}FC"), tags=('total',))
-        self.tree_historique.tag_configure('total', background='#E0E0E0', font=('Arial', 10, 'bold'))
+            self.tree_historique.insert("", tk.END, values=(vente[1], vente[2], vente[3], f"{vente[4]:.0f}", f"{vente[5]:.0f}", vente[6] or ""))
+
+        if ventes:
+            self.historique_curseur = (ventes[-1][1], ventes[-1][0])
+        if len(ventes) < self.TAILLE_PAGE_HISTORIQUE:
+            self.historique_complet = True
+
+    def defilement_historique(self, premier, dernier):
+        """Suit le défilement de l'historique et charge la page suivante à l'approche du bas."""
+        self.scrollbar_historique.set(premier, dernier)
+        if float(dernier) >= 0.9 and not self.historique_complet and not self.historique_page_prevue:
+            self.historique_page_prevue = True
+            self.root.after_idle(self.charger_page_historique)
         
     def setup_interface_historique(self, tab_frame):
         filter_frame = ctk.CTkFrame(tab_frame)
@@ -1016,116 +2917,64 @@ class ApplicationEcommerce:
         tree_frame = ctk.CTkFrame(tab_frame)
         tree_frame.pack(pady=10, padx=20, fill="both", expand=True)
         
-        self.tree_historique = ttk.Treeview(tree_frame, columns=("Date", "Produit", "Qté", "Prix U", "Total"), show='headings')
+        self.tree_historique = ttk.Treeview(tree_frame, columns=("Date", "Produit", "Qté", "Prix U", "Total", "Caisse"), show='headings')
         self.tree_historique.heading("Date", text="Date Vente", anchor="center")
         self.tree_historique.heading("Produit", text="Produit", anchor="center")
         self.tree_historique.heading("Qté", text="Qté", anchor="center")
         self.tree_historique.heading("Prix U", text="Prix U (FC)", anchor="center")
         self.tree_historique.heading("Total", text="Total (FC)", anchor="center")
+        self.tree_historique.heading("Caisse", text="Caisse", anchor="center")
         
         self.tree_historique.column("Date", width=150, stretch=tk.NO)
         self.tree_historique.column("Produit", width=250, stretch=tk.YES)
         self.tree_historique.column("Qté", width=70, stretch=tk.NO)
         self.tree_historique.column("Prix U", width=100, stretch=tk.NO)
         self.tree_historique.column("Total", width=100, stretch=tk.NO)
+        self.tree_historique.column("Caisse", width=100, stretch=tk.NO)
         
         self.tree_historique.pack(side="left", fill="both", expand=True)
 
-        scrollbar = ctk.CTkScrollbar(tree_frame, command=self.tree_historique.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.tree_historique.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar_historique = ctk.CTkScrollbar(tree_frame, command=self.tree_historique.yview)
+        self.scrollbar_historique.pack(side="right", fill="y")
+        # Chargement des pages suivantes au fil du défilement
+        self.tree_historique.configure(yscrollcommand=self.defilement_historique)
+
+        # Pied de tableau : total de la période
+        self.label_total_historique = ctk.CTkLabel(tab_frame, text="TOTAL VENTES : 0 FC", font=("Arial", 14, "bold"))
+        self.label_total_historique.pack(pady=(0, 5))
         
         self.action_filtrer_ventes() # Chargement initial de l'historique (sans filtre)
         
         # Bouton d'export PDF
-        btn_pdf = ctk.CTkButton(tab_frame, text="📥 Exporter Rapport PDF de Ventes", command=lambda: self.action_generer_rapport_ventes(self.db.recuperer_ventes(self.entry_date_debut.get(), self.entry_date_fin.get()), "Rapport de Ventes"), fg_color="#3498DB", hover_color="#2980B9")
+        btn_pdf = ctk.CTkButton(tab_frame, text="📥 Exporter Rapport PDF de Ventes", command=lambda: self.action_generer_rapport_ventes("Rapport de Ventes"), fg_color="#3498DB", hover_color="#2980B9")
         btn_pdf.pack(pady=(10, 20), padx=20, fill="x")
 
-    def action_generer_rapport_ventes(self, data, titre):
-        # ... (Logique de génération de PDF - inchangée)
-        try:
-            if not data:
-                messagebox.showwarning("Export PDF", "Aucune donnée de vente à exporter.")
-                return
+    def action_generer_rapport_ventes(self, titre):
+        """Export PDF : comptage sur le thread base de données, génération en flux sur le pool de calcul."""
+        date_debut = self.entry_date_debut.get()
+        date_fin = self.entry_date_fin.get()
+        self.executeur.soumettre_db("calculer_total_ventes", date_debut, date_fin,
+                                    au_succes=lambda total: self.exporter_rapport_ventes(titre, total[0], date_debut, date_fin))
 
-            taux_cdf = self.db.get_taux_usd_cdf()
-            
-            # Utiliser filedialog pour choisir l'emplacement de sauvegarde
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF files", "*.pdf")],
-                initialfile=f"{titre}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            )
-            
-            if not filename:
-                return # Annulé par l'utilisateur
-            
-            doc = SimpleDocTemplate(filename, pagesize=A4)
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # En-tête (inclure le taux)
-            elements.append(Paragraph(titre, styles['h1']))
-            elements.append(Paragraph(f"Taux de conversion utilisé : 1 USD = {taux_cdf:.2f} CDF", styles['h3']))
-            elements.append(Paragraph(f"Généré par le système le {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
-            elements.append(Paragraph("<br/>", styles['Normal']))
-
-            # Préparation des données pour la table PDF
-            # Changement des entêtes de colonnes : CDF est la base, USD est la conversion
-            data_table = [["Date", "Produit", "Qté", "Prix U (CDF)", "Total (CDF)", "Total (USD)"]]
-            total_general_cdf = 0 # Le nouveau total de base
-            total_general_usd = 0 
-
-            # data contient (date_vente, nom, qte, prix_u_cdf, total_cdf)
-            for date_vente, nom, qte, prix_u_cdf, total_cdf in data:
-                # Conversion : CDF / Taux = USD
-                try:
-                    # La valeur en USD est la valeur CDF divisée par le taux
-                    total_usd = total_cdf / taux_cdf
-                except ZeroDivisionError:
-                    total_usd = 0.0 # Éviter la division par zéro si le taux est 0
+    def exporter_rapport_ventes(self, titre, nb_ventes, date_debut, date_fin):
+        if not nb_ventes:
+            messagebox.showwarning("Export PDF", "Aucune donnée de vente à exporter.")
+            return
 
-                total_general_cdf += total_cdf
-                total_general_usd += total_usd
-
-                # AJOUT DES VALEURS dans le tableau
-                data_table.append([
-                    date_vente.split(' ')[0],
-                    nom,
-                    qte,
-                    f"{prix_u_cdf:.0f} FC",
-                    f"{total_cdf:.0f} FC",
-                    f"{total_usd:.2f} $" # Affichage en USD (2 décimales)
-                ])
-
-            # Ligne du total (mise à jour pour les deux devises)
-            data_table.append(["", "", "", "TOTAL GÉNÉRAL :", 
-                               f"{total_general_cdf:.0f} FC", # Total en CDF (Base)
-                               f"{total_general_usd:.2f} $"]) # Total converti en USD
-
-            # Configuration de la table (taille ajustée)
-            table = Table(data_table, colWidths=[1.1*inch, 1.5*inch, 0.5*inch, 1*inch, 1*inch, 1.2*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                # Style pour la ligne TOTAL
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('ALIGN', (3, -1), (-1, -1), 'RIGHT'),
-            ]))
-            
-            elements.append(table)
-            
-            doc.build(elements)
-            messagebox.showinfo("Export PDF", f"Rapport '{titre}' généré avec succès à l'emplacement:\n{filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Erreur PDF", f"Erreur lors de la génération du rapport : {e}")
+        # Utiliser filedialog pour choisir l'emplacement de sauvegarde
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf")],
+            initialfile=f"{titre}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        )
+        
+        if not filename:
+            return # Annulé par l'utilisateur
+
+        self.executeur.soumettre_lecture(
+            generer_rapport_ventes_pdf, filename, date_debut, date_fin, titre,
+            au_succes=lambda _: messagebox.showinfo("Export PDF", f"Rapport '{titre}' généré avec succès à l'emplacement:\n{filename}"),
+            a_erreur=lambda e: messagebox.showerror("Erreur PDF", f"Erreur lors de la génération du rapport : {e}"))
 
 
     def setup_interface_journal_stock(self, tab_frame):
@@ -1171,8 +3020,7 @@ class ApplicationEcommerce:
         # NOUVEAU: Bouton d'export PDF pour le journal de stock
         btn_pdf_stock = ctk.CTkButton(tab_frame, text="📥 Exporter Rapport PDF du Journal de Stock", command=self.action_generer_rapport_stock, fg_color="#3498DB", hover_color="#2980B9")
         btn_pdf_stock.pack(pady=(10, 20), padx=20, fill="x")
-        
-        self.rafraichir_journal_stock() # Appel initial
+        # Chargement initial fait par preparer_onglet
 
     def action_filtrer_journal_stock(self):
         """Action du bouton Filtrer du journal de stock."""
@@ -1180,11 +3028,8 @@ class ApplicationEcommerce:
         self.rafraichir_journal_stock()
 
     def rafraichir_journal_stock(self):
-        if not hasattr(self, 'tree_journal_stock'): 
-            return 
-            
-        for row in self.tree_journal_stock.get_children():
-            self.tree_journal_stock.delete(row)
+        if not self.onglet_visible(self.ONGLET_JOURNAL):
+            return # Onglet non construit ou caché : rechargé à sa prochaine sélection
         
         # AJOUT: Récupérer les filtres de dates
         date_debut = None
@@ -1196,76 +3041,48 @@ class ApplicationEcommerce:
             date_fin = self.entry_journal_date_fin.get()
             if not date_fin: date_fin = None
             
-        # MODIF: Passage des filtres à la méthode backend
-        entrees = self.db.recuperer_journal_stock(date_debut, date_fin) 
+        # MODIF: Passage des filtres à la méthode backend (sur le thread base de données)
+        self.journal_generation = getattr(self, 'journal_generation', 0) + 1
+        generation = self.journal_generation
+        self.executeur.soumettre_db("recuperer_journal_stock", date_debut, date_fin,
+                                    au_succes=lambda entrees: self.afficher_journal_stock(entrees, generation))
+
+    def afficher_journal_stock(self, entrees, generation):
+        if generation != self.journal_generation:
+            return # Un rafraîchissement plus récent est en cours
+
+        for row in self.tree_journal_stock.get_children():
+            self.tree_journal_stock.delete(row)
         
         for date_entree, nom, quantite_ajoutee in entrees:
             self.tree_journal_stock.insert("", tk.END, values=(date_entree, nom, quantite_ajoutee))
 
     def action_generer_rapport_stock(self):
-        try:
-            date_debut = self.entry_journal_date_debut.get() if hasattr(self, 'entry_journal_date_debut') else None
-            date_fin = self.entry_journal_date_fin.get() if hasattr(self, 'entry_journal_date_fin') else None
-            data = self.db.recuperer_journal_stock(date_debut, date_fin) 
-            
-            if not data:
-                messagebox.showwarning("Export PDF", "Aucune donnée d'entrée de stock à exporter.")
-                return
+        """Export PDF du journal : comptage sur le thread base de données, génération en flux sur le pool de calcul."""
+        date_debut = self.entry_journal_date_debut.get() if hasattr(self, 'entry_journal_date_debut') else None
+        date_fin = self.entry_journal_date_fin.get() if hasattr(self, 'entry_journal_date_fin') else None
+        self.executeur.soumettre_db("calculer_total_journal_stock", date_debut, date_fin,
+                                    au_succes=lambda total: self.exporter_rapport_stock(total[0], date_debut, date_fin))
+
+    def exporter_rapport_stock(self, nb_entrees, date_debut, date_fin):
+        if not nb_entrees:
+            messagebox.showwarning("Export PDF", "Aucune donnée d'entrée de stock à exporter.")
+            return
 
-            # Utiliser filedialog pour choisir l'emplacement de sauvegarde
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF files", "*.pdf")],
-                initialfile=f"Journal_Stock_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            )
-            
-            if not filename:
-                return # Annulé par l'utilisateur
-            
-            doc = SimpleDocTemplate(filename, pagesize=A4)
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # En-tête
-            elements.append(Paragraph("JOURNAL DES ENTRÉES DE STOCK", styles['h1']))
-            elements.append(Paragraph(f"Période filtrée : {date_debut or 'Début'} à {date_fin or 'Fin'}", styles['h3']))
-            elements.append(Paragraph(f"Généré par le système le {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
-            elements.append(Paragraph("<br/>", styles['Normal']))
-
-            # Préparation des données pour la table PDF
-            data_table = [["Date d'Entrée", "Produit", "Quantité Ajoutée"]]
-            total_ajoute = 0 
-
-            # data contient (date_entree, nom, quantite_ajoutee)
-            for date_entree, nom, quantite_ajoutee in data:
-                data_table.append([date_entree, nom, quantite_ajoutee])
-                total_ajoute += quantite_ajoutee
-
-            # Ligne du total
-            data_table.append(["", "TOTAL ARTICLES AJOUTÉS :", total_ajoute])
-
-            # Configuration de la table
-            table = Table(data_table, colWidths=[1.5*inch, 3*inch, 1.5*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                # Style pour la ligne TOTAL
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ]))
-            
-            elements.append(table)
-            
-            doc.build(elements)
-            messagebox.showinfo("Export PDF", f"Rapport 'Journal de Stock' généré avec succès à l'emplacement:\n{filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Erreur PDF", f"Erreur lors de la génération du PDF du journal de stock : {e}")
+        # Utiliser filedialog pour choisir l'emplacement de sauvegarde
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf")],
+            initialfile=f"Journal_Stock_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        )
+        
+        if not filename:
+            return # Annulé par l'utilisateur
+
+        self.executeur.soumettre_lecture(
+            generer_rapport_stock_pdf, filename, date_debut, date_fin,
+            au_succes=lambda _: messagebox.showinfo("Export PDF", f"Rapport 'Journal de Stock' généré avec succès à l'emplacement:\n{filename}"),
+            a_erreur=lambda e: messagebox.showerror("Erreur PDF", f"Erreur lors de la génération du PDF du journal de stock : {e}"))
 
     def setup_interface_administration(self, tab_frame):
         main_scroll_frame = ctk.CTkScrollableFrame(tab_frame, label_text="")
@@ -1367,12 +3184,106 @@ class ApplicationEcommerce:
 
         btn_restauration = ctk.CTkButton(backup_frame, text="🔄 Restaurer la Base de Données", command=self.action_restaurer_bdd, fg_color="#F39C12")
         btn_restauration.grid(row=1, column=1, padx=10, pady=15, sticky="ew")
+
+        btn_resume = ctk.CTkButton(backup_frame, text="📊 Reconstruire le Résumé des Ventes", command=self.action_reconstruire_resume_ventes, fg_color="#7F8C8D")
+        btn_resume.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 15), sticky="ew")
+
+        self.btn_sauvegarde = btn_sauvegarde
+        self.barre_sauvegarde = ctk.CTkProgressBar(backup_frame)
+        self.barre_sauvegarde.grid(row=3, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="ew")
+        self.barre_sauvegarde.set(0)
+        self.label_sauvegarde = ctk.CTkLabel(backup_frame, text="")
+        self.label_sauvegarde.grid(row=4, column=0, columnspan=2, padx=10, pady=(0, 15))
         
         backup_frame.grid_columnconfigure((0, 1), weight=1)
 
+        # -------------------- SECTION IMPORT / EXPORT CSV --------------------
+        separator_csv = ctk.CTkFrame(main_scroll_frame, height=2, fg_color="gray")
+        separator_csv.pack(fill="x", padx=20, pady=20)
+
+        csv_frame = ctk.CTkFrame(main_scroll_frame)
+        csv_frame.pack(pady=10, padx=20, fill="x")
+
+        ctk.CTkLabel(csv_frame, text="IMPORT / EXPORT CSV", font=("Arial", 18, "bold")).grid(row=0, column=0, columnspan=2, pady=10)
+
+        btn_import_csv = ctk.CTkButton(csv_frame, text="📂 Importer des Produits (CSV)", command=self.action_importer_produits_csv, fg_color="#1E8449")
+        btn_import_csv.grid(row=1, column=0, columnspan=2, padx=10, pady=(5, 10), sticky="ew")
+
+        btn_export_produits = ctk.CTkButton(csv_frame, text="📤 Exporter les Produits", command=lambda: self.action_exporter_csv("produits"), fg_color="#3498DB")
+        btn_export_produits.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
+
+        btn_export_ventes = ctk.CTkButton(csv_frame, text="📤 Exporter les Ventes", command=lambda: self.action_exporter_csv("ventes"), fg_color="#3498DB")
+        btn_export_ventes.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+
+        btn_export_journal = ctk.CTkButton(csv_frame, text="📤 Exporter le Journal de Stock", command=lambda: self.action_exporter_csv("journal_stock"), fg_color="#3498DB")
+        btn_export_journal.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
+
+        self.barre_csv = ctk.CTkProgressBar(csv_frame)
+        self.barre_csv.grid(row=4, column=0, columnspan=2, padx=10, pady=(10, 5), sticky="ew")
+        self.barre_csv.set(0)
+        self.label_csv = ctk.CTkLabel(csv_frame, text="")
+        self.label_csv.grid(row=5, column=0, columnspan=2, padx=10, pady=(0, 15))
+
+        csv_frame.grid_columnconfigure((0, 1), weight=1)
+
+        # -------------------- SECTION STATISTIQUES DES REQUÊTES --------------------
+        separator_stats = ctk.CTkFrame(main_scroll_frame, height=2, fg_color="gray")
+        separator_stats.pack(fill="x", padx=20, pady=20)
+
+        stats_frame = ctk.CTkFrame(main_scroll_frame)
+        stats_frame.pack(pady=10, padx=20, fill="x")
+
+        ctk.CTkLabel(stats_frame, text="STATISTIQUES DES REQUÊTES", font=("Arial", 18, "bold")).pack(pady=10)
+        self.label_stats = ctk.CTkLabel(stats_frame, text="")
+        self.label_stats.pack(padx=10)
+
+        colonnes_stats = ("Méthode", "Appels", "Total", "Moyenne", "p95", "Max", "Répartition")
+        self.tree_stats = ttk.Treeview(stats_frame, columns=colonnes_stats, show='headings', height=8)
+        for colonne, titre, largeur in zip(colonnes_stats, ("Méthode", "Appels", "Total ms", "Moy. ms", "p95 ms", "Max ms",
+                                                            "Répartition (0,1 ms → 1 s)"),
+                                           (200, 60, 80, 70, 70, 70, 140)):
+            self.tree_stats.heading(colonne, text=titre, anchor="center")
+            self.tree_stats.column(colonne, width=largeur, stretch=tk.YES if colonne == "Méthode" else tk.NO)
+        self.tree_stats.pack(padx=10, pady=5, fill="x")
+
+        ctk.CTkLabel(stats_frame, text="Requêtes lentes (les plus récentes en premier) :").pack(padx=10, anchor="w")
+        self.texte_requetes_lentes = ctk.CTkTextbox(stats_frame, height=120)
+        self.texte_requetes_lentes.pack(padx=10, pady=5, fill="x")
+
+        btn_reinit_stats = ctk.CTkButton(stats_frame, text="🧹 Réinitialiser les Statistiques", command=self.action_reinitialiser_statistiques, fg_color="#7F8C8D")
+        btn_reinit_stats.pack(padx=10, pady=(5, 15), fill="x")
+
+        if STATISTIQUES_REQUETES is None:
+            self.label_stats.configure(text="Instrumentation désactivée : relancer avec l'option --instrumenter.")
+            btn_reinit_stats.configure(state="disabled")
+
 
         self.rafraichir_utilisateurs() # Appel initial
 
+    def rafraichir_statistiques_requetes(self):
+        """Panneau des statistiques de requêtes, mis à jour par surveiller_base quand l'onglet est affiché."""
+        if STATISTIQUES_REQUETES is None or not self.onglet_visible(self.ONGLET_ADMIN):
+            return
+        lignes, lentes = STATISTIQUES_REQUETES.instantane()
+        self.label_stats.configure(text=f"{sum(ligne[1] for ligne in lignes)} appel(s) mesuré(s) ; "
+                                        f"seuil des requêtes lentes : {STATISTIQUES_REQUETES.seuil_lent_ms:g} ms")
+        self.tree_stats.delete(*self.tree_stats.get_children())
+        barres = " ▁▂▃▄▅▆▇█"
+        for methode, appels, total, moyenne, p95, maximum, histogramme in lignes[:30]:
+            plus_grand = max(histogramme) or 1
+            repartition = "".join(barres[-(-8 * nombre // plus_grand)] for nombre in histogramme) # Arrondi supérieur
+            self.tree_stats.insert("", tk.END, values=(methode, appels, f"{total:.1f}", f"{moyenne:.2f}",
+                                                       f"{p95:.2f}", f"{maximum:.1f}", repartition))
+
+        self.texte_requetes_lentes.delete("1.0", tk.END)
+        self.texte_requetes_lentes.insert("1.0", "\n".join(
+            f"{heure}  {duree:.1f} ms  {methode} : {sql}\n    plan : {plan}"
+            for heure, methode, duree, sql, plan in reversed(lentes)))
+
+    def action_reinitialiser_statistiques(self):
+        STATISTIQUES_REQUETES.reinitialiser()
+        self.rafraichir_statistiques_requetes()
+
     def rafraichir_utilisateurs(self):
         for row in self.tree_users.get_children():
             self.tree_users.delete(row)
@@ -1430,7 +3341,27 @@ class ApplicationEcommerce:
                  messagebox.showerror("Erreur", "Impossible de supprimer cet utilisateur.")
 
     def action_sauvegarder_bdd(self):
-        backup_path = self.db.sauvegarder_bdd()
+        # Copie et compression sur le pool de calcul, avec sa propre connexion : la caisse reste utilisable
+        self.btn_sauvegarde.configure(state="disabled")
+        self.barre_sauvegarde.set(0)
+        self.label_sauvegarde.configure(text="Sauvegarde en cours...")
+        self.executeur.soumettre_lecture(
+            "sauvegarder_bdd", progression=self.executeur.rappel_interface(self.afficher_progression_sauvegarde),
+            au_succes=self.fin_sauvegarder_bdd, a_erreur=self.erreur_sauvegarder_bdd)
+
+    def afficher_progression_sauvegarde(self, etape, fraction):
+        # Copie des pages sur la première moitié de la barre, compression sur la seconde
+        self.barre_sauvegarde.set(fraction / 2 if etape == "copie" else 0.5 + fraction / 2)
+        self.label_sauvegarde.configure(text=f"Sauvegarde : {etape} {fraction:.0%}")
+
+    def erreur_sauvegarder_bdd(self, erreur):
+        print(f"Erreur de sauvegarde: {erreur}")
+        self.fin_sauvegarder_bdd(None)
+
+    def fin_sauvegarder_bdd(self, backup_path):
+        self.btn_sauvegarde.configure(state="normal")
+        self.label_sauvegarde.configure(text="")
+        self.barre_sauvegarde.set(1 if backup_path else 0)
         if backup_path:
             messagebox.showinfo("Sauvegarde Réussie", f"La base de données a été sauvegardée dans : {backup_path}")
         else:
@@ -1446,8 +3377,8 @@ class ApplicationEcommerce:
             return
 
         backup_filepath = filedialog.askopenfilename(
-            title="Sélectionner le Fichier de Sauvegarde (.db)",
-            filetypes=(("Fichiers de base de données SQLite", "*.db"), ("Tous les fichiers", "*.*"))
+            title="Sélectionner le Fichier de Sauvegarde (.db.gz ou .db)",
+            filetypes=(("Sauvegardes", "*.db.gz *.db"), ("Tous les fichiers", "*.*"))
         )
         if not backup_filepath:
             return 
@@ -1456,11 +3387,75 @@ class ApplicationEcommerce:
         if success:
             messagebox.showinfo("Restauration Réussie", "La base de données a été restaurée avec succès. Toutes les listes vont être rafraîchies.")
             self.rafraichir_listes()
+            self.rafraichir_journal_stock()
             self.rafraichir_utilisateurs()
         else:
             messagebox.showerror("Erreur de Restauration", "Une erreur est survenue lors de la restauration.\n"
                                 "Veuillez vérifier que le fichier sélectionné est valide et non corrompu.")
 
+    def action_reconstruire_resume_ventes(self):
+        try:
+            self.db.reconstruire_resume_ventes()
+            messagebox.showinfo("Résumé des Ventes", "Le résumé journalier des ventes a été recalculé.")
+        except sqlite3.Error as e:
+            messagebox.showerror("Erreur", f"Impossible de recalculer le résumé des ventes : {e}")
+
+    def action_importer_produits_csv(self):
+        chemin = filedialog.askopenfilename(
+            title="Importer des produits",
+            filetypes=[("Fichiers CSV", "*.csv"), ("Tous les fichiers", "*.*")]
+        )
+        if not chemin:
+            return # Annulé par l'utilisateur
+
+        self.barre_csv.set(0)
+        self.label_csv.configure(text="Import en cours...")
+        # Import sur le thread base de données, progression renvoyée au thread Tk
+        self.executeur.soumettre_db("importer_produits_csv", chemin,
+                                    progression=self.executeur.rappel_interface(self.afficher_progression_csv),
+                                    au_succes=self.fin_importer_produits_csv,
+                                    a_erreur=self.erreur_csv)
+
+    def fin_importer_produits_csv(self, resultat):
+        succes, message = resultat
+        self.label_csv.configure(text=message.split("\n")[0])
+        if succes:
+            messagebox.showinfo("Import CSV", message)
+            self.rafraichir_listes() # Le catalogue est relu (la base a été modifiée par une autre connexion)
+        else:
+            messagebox.showerror("Import CSV", message)
+
+    def action_exporter_csv(self, table):
+        chemin = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("Fichiers CSV", "*.csv")],
+            initialfile=f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
+        if not chemin:
+            return # Annulé par l'utilisateur
+
+        self.barre_csv.set(0)
+        self.label_csv.configure(text="Export en cours...")
+        self.executeur.soumettre_lecture(
+            "exporter_csv", table, chemin,
+            progression=self.executeur.rappel_interface(self.afficher_progression_csv),
+            au_succes=lambda nb_lignes: self.fin_exporter_csv(chemin, nb_lignes),
+            a_erreur=self.erreur_csv)
+
+    def fin_exporter_csv(self, chemin, nb_lignes):
+        self.barre_csv.set(1)
+        self.label_csv.configure(text=f"{nb_lignes} ligne(s) exportée(s).")
+        messagebox.showinfo("Export CSV", f"{nb_lignes} ligne(s) exportée(s) dans :\n{chemin}")
+
+    def afficher_progression_csv(self, nb_lignes, fraction):
+        self.label_csv.configure(text=f"{nb_lignes} ligne(s) traitée(s)...")
+        if fraction is not None:
+            self.barre_csv.set(fraction)
+
+    def erreur_csv(self, erreur):
+        self.label_csv.configure(text="")
+        messagebox.showerror("Erreur CSV", f"L'opération a échoué (aucune modification enregistrée) : {erreur}")
+
     def selectionner_utilisateur(self, event):
         selected_item = self.tree_users.focus()
         if selected_item:
@@ -1500,11 +3495,1018 @@ class ApplicationEcommerce:
             messagebox.showerror("Erreur", "Veuillez entrer une valeur numérique positive pour le taux.")
 
 
-if __name__ == "__main__":
+
+# --- PARTIE 3 : TÂCHES EN ARRIÈRE-PLAN ---
+class ExecuteurTaches:
+    """
+    Exécute le travail lourd hors de la boucle Tk :
+    - un thread dédié à la base de données, propriétaire de sa propre connexion SQLite
+      (une connexion sqlite3 ne doit pas être partagée entre threads) ;
+    - un pool de threads pour le travail de calcul (mise en page des PDF...).
+    Les résultats sont renvoyés au thread Tk par une boucle root.after : les callbacks
+    au_succes / a_erreur s'exécutent toujours sur le thread de l'interface.
+    """
+    INTERVALLE_SONDAGE = 50 # ms entre deux relevés des tâches terminées
+
+    def __init__(self, root, db_name, profil="rapide", nb_threads_calcul=2,
+                 au_changement_occupation=None, a_erreur_defaut=None, caisse_id=None, serveur=None, jeton=None):
+        self.root = root
+        self.au_changement_occupation = au_changement_occupation
+        self.a_erreur_defaut = a_erreur_defaut
+        self.nb_en_cours = 0
+        self.db_name = db_name
+        self.profil = profil
+        self.caisse_id = caisse_id
+        self.serveur = serveur # "hôte:port" : les connexions sont des clients du serveur de caisses
+        self.jeton = jeton
+        self.locaux = threading.local() # Connexion propre à chaque thread du pool (soumettre_lecture)
+
+        self.file_db = queue.Queue()       # Tâches pour le thread base de données
+        self.file_retours = queue.Queue()  # Tâches terminées, à traiter sur le thread Tk
+        self.file_signaux = queue.Queue()  # Appels demandés par les tâches en cours (progression)
+        self.pool = ThreadPoolExecutor(max_workers=nb_threads_calcul, thread_name_prefix="calcul")
+
+        self.thread_db = threading.Thread(target=self.boucle_db,
+                                          name="base-de-donnees", daemon=True)
+        self.thread_db.start()
+        self.id_sondage = self.root.after(self.INTERVALLE_SONDAGE, self.sonder)
+
+    def boucle_db(self):
+        """Boucle du thread base de données : exécute les tâches une par une sur sa connexion."""
+        try:
+            db = ouvrir_base(self.db_name, self.profil, self.caisse_id, self.serveur, self.jeton)
+        except Exception as e:
+            self.refuser_taches_db(e)
+            return
+        while True:
+            tache = self.file_db.get()
+            if tache is None:
+                break
+            future, fonction, args, kwargs = tache
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                # fonction : nom d'une méthode de GestionBaseDeDonnees, ou callable(db, *args)
+                if isinstance(fonction, str):
+                    future.set_result(getattr(db, fonction)(*args, **kwargs))
+                else:
+                    future.set_result(fonction(db, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        db.conn.close()
+
+    def refuser_taches_db(self, erreur):
+        """
+        Connexion impossible (base verrouillée, droits, disque...) : l'erreur est signalée à l'interface,
+        puis chaque tâche en attente ou soumise ensuite échoue avec elle au lieu d'attendre indéfiniment.
+        """
+        if self.a_erreur_defaut:
+            self.file_signaux.put((self.a_erreur_defaut, (erreur,)))
+        else:
+            print(f"Erreur d'ouverture de la base (thread base de données): {erreur}")
+        while True:
+            tache = self.file_db.get()
+            if tache is None:
+                break
+            future = tache[0]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(erreur)
+
+    def soumettre_db(self, fonction, *args, au_succes=None, a_erreur=None, **kwargs):
+        """Exécute fonction sur le thread base de données et retourne un Future."""
+        future = Future()
+        self.suivre(future, au_succes, a_erreur)
+        self.file_db.put((future, fonction, args, kwargs))
+        return future
+
+    def soumettre_calcul(self, fonction, *args, au_succes=None, a_erreur=None, **kwargs):
+        """Exécute fonction(*args) sur le pool de calcul et retourne un Future."""
+        future = self.pool.submit(fonction, *args, **kwargs)
+        self.suivre(future, au_succes, a_erreur)
+        return future
+
+    def soumettre_lecture(self, fonction, *args, au_succes=None, a_erreur=None, **kwargs):
+        """
+        Exécute fonction(db, *args) sur le pool de calcul avec une connexion propre au thread
+        (fonction peut aussi être le nom d'une méthode de la connexion, comme pour soumettre_db).
+        Pour les longues lectures (rapports en flux, sauvegardes) qui ne doivent pas bloquer le thread base de données.
+        """
+        return self.soumettre_calcul(self.executer_lecture, fonction, args, kwargs,
+                                     au_succes=au_succes, a_erreur=a_erreur)
+
+    def executer_lecture(self, fonction, args, kwargs):
+        db = getattr(self.locaux, 'db', None)
+        if db is None:
+            db = self.locaux.db = ouvrir_base(self.db_name, self.profil, self.caisse_id, self.serveur, self.jeton)
+        if isinstance(fonction, str):
+            return getattr(db, fonction)(*args, **kwargs)
+        return fonction(db, *args, **kwargs)
+
+    def rappel_interface(self, fonction):
+        """
+        Retourne un callable utilisable depuis n'importe quel thread : chaque appel exécute
+        fonction(*args) sur le thread Tk au prochain relevé (ex. progression d'un import).
+        """
+        return lambda *args: self.file_signaux.put((fonction, args))
+
+    def suivre(self, future, au_succes, a_erreur):
+        self.nb_en_cours += 1
+        if self.nb_en_cours == 1 and self.au_changement_occupation:
+            self.au_changement_occupation(True)
+        future.add_done_callback(lambda f: self.file_retours.put((f, au_succes, a_erreur)))
+
+    def sonder(self):
+        """Traite (sur le thread Tk) les tâches terminées depuis le dernier passage."""
+        try:
+            # Signaux en premier : la dernière progression s'affiche avant le résultat
+            while True:
+                try:
+                    fonction, args = self.file_signaux.get_nowait()
+                except queue.Empty:
+                    break
+                fonction(*args)
+
+            while True:
+                try:
+                    future, au_succes, a_erreur = self.file_retours.get_nowait()
+                except queue.Empty:
+                    break
+
+                self.nb_en_cours -= 1
+                if self.nb_en_cours == 0 and self.au_changement_occupation:
+                    self.au_changement_occupation(False)
+
+                if future.cancelled():
+                    continue
+                erreur = future.exception()
+                if erreur is not None:
+                    gestionnaire = a_erreur or self.a_erreur_defaut
+                    if gestionnaire:
+                        gestionnaire(erreur)
+                    else:
+                        print(f"Erreur de tâche d'arrière-plan: {erreur}")
+                elif au_succes:
+                    au_succes(future.result())
+        finally:
+            # Toujours reprogrammer le relevé, même si un callback a levé une exception
+            self.id_sondage = self.root.after(self.INTERVALLE_SONDAGE, self.sonder)
+
+    def arreter(self):
+        """Arrête le thread base de données et le pool de calcul (à la fermeture de la fenêtre)."""
+        self.root.after_cancel(self.id_sondage)
+        self.file_db.put(None)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- PARTIE 4 : RAPPORTS PDF ---
+class RapportPDFFlux:
+    """
+    Rapport PDF tabulaire généré en flux : les lignes sont reçues au fil de l'eau et
+    chaque page est dessinée dès qu'elle est pleine (une Table par page, en-tête répété).
+    Seule la page en cours est gardée en mémoire, quel que soit le nombre de lignes.
+    """
+    MARGE = 54 # Points PDF (0,75 pouce)
+    LIGNES_PREMIERE_PAGE = 28 # La première page porte aussi le titre
+    LIGNES_PAR_PAGE = 36
+
+    def __init__(self, filename, titre, sous_titres, entetes, largeurs, style_total=()):
+        importer_reportlab()
+        self.filename = filename
+        self.entetes = entetes
+        self.largeurs = largeurs
+        self.style_total = list(style_total)
+        self.lignes_page = []
+        self.nb_lignes = 0
+        self.numero_page = 1
+
+        self.canvas = canvas.Canvas(filename, pagesize=A4, pageCompression=1)
+        self.largeur_page, self.hauteur_page = A4
+        self.y = self.hauteur_page - self.MARGE
+
+        # En-tête du document (première page uniquement)
+        styles = getSampleStyleSheet()
+        self.dessiner_paragraphe(Paragraph(titre, styles['h1']))
+        for sous_titre in sous_titres:
+            self.dessiner_paragraphe(Paragraph(sous_titre, styles['Normal']))
+        self.y -= 12
+        self.capacite_page = self.LIGNES_PREMIERE_PAGE
+
+    def dessiner_paragraphe(self, paragraphe):
+        largeur_utile = self.largeur_page - 2 * self.MARGE
+        _, hauteur = paragraphe.wrapOn(self.canvas, largeur_utile, self.y)
+        self.y -= hauteur
+        paragraphe.drawOn(self.canvas, self.MARGE, self.y)
+        self.y -= 4
+
+    def style_table(self, avec_total):
+        style = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]
+        if avec_total:
+            # Style pour la ligne TOTAL
+            style += [
+                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ] + self.style_total
+        return TableStyle(style)
+
+    def ajouter_ligne(self, ligne):
+        self.lignes_page.append(ligne)
+        self.nb_lignes += 1
+        if len(self.lignes_page) >= self.capacite_page:
+            self.vider_page()
+            self.nouvelle_page()
+
+    def vider_page(self, avec_total=False):
+        """Dessine la Table de la page en cours (en-tête + lignes accumulées)."""
+        table = Table([self.entetes] + self.lignes_page, colWidths=self.largeurs)
+        table.setStyle(self.style_table(avec_total))
+        _, hauteur = table.wrapOn(self.canvas, self.largeur_page - 2 * self.MARGE, self.y)
+        table.drawOn(self.canvas, self.MARGE, self.y - hauteur)
+        self.canvas.setFont("Helvetica", 8)
+        self.canvas.drawRightString(self.largeur_page - self.MARGE, self.MARGE / 2, f"Page {self.numero_page}")
+        self.lignes_page = []
+
+    def nouvelle_page(self):
+        self.canvas.showPage()
+        self.numero_page += 1
+        self.y = self.hauteur_page - self.MARGE
+        self.capacite_page = self.LIGNES_PAR_PAGE
+
+    def terminer(self, ligne_total):
+        """Ajoute la ligne de total sur la dernière page puis écrit le fichier. Retourne le nombre de lignes."""
+        self.lignes_page.append(ligne_total)
+        self.vider_page(avec_total=True)
+        self.canvas.showPage()
+        self.canvas.save()
+        return self.nb_lignes
+
+
+def generer_rapport_ventes_pdf(db, filename, date_debut=None, date_fin=None, titre="Rapport de Ventes"):
+    """Génère le PDF de l'historique des ventes en lisant les ventes par lots. Retourne le nombre de ventes."""
+    importer_reportlab()
+    taux_cdf = db.get_taux_usd_cdf()
+    rapport = RapportPDFFlux(
+        filename, titre,
+        [f"Taux de conversion utilisé : 1 USD = {taux_cdf:.2f} CDF",
+         f"Période filtrée : {date_debut or 'Début'} à {date_fin or 'Fin'}",
+         f"Généré par le système le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"],
+        # Changement des entêtes de colonnes : CDF est la base, USD est la conversion
+        ["Date", "Produit", "Qté", "Prix U (CDF)", "Total (CDF)", "Total (USD)"],
+        [1.1*inch, 1.5*inch, 0.5*inch, 1*inch, 1*inch, 1.2*inch],
+        style_total=[('ALIGN', (3, -1), (-1, -1), 'RIGHT')],
+    )
+    total_general_cdf = 0 # Le nouveau total de base
+    total_general_usd = 0 
+
+    # Chaque lot contient des lignes (date_vente, nom, qte, prix_u_cdf, total_cdf)
+    for lot in db.iterer_ventes(date_debut, date_fin):
+        for date_vente, nom, qte, prix_u_cdf, total_cdf in lot:
+            # Conversion : CDF / Taux = USD
+            try:
+                total_usd = total_cdf / taux_cdf
+            except ZeroDivisionError:
+                total_usd = 0.0 # Éviter la division par zéro si le taux est 0
+
+            total_general_cdf += total_cdf
+            total_general_usd += total_usd
+
+            rapport.ajouter_ligne([
+                date_vente.split(' ')[0],
+                nom,
+                qte,
+                f"{prix_u_cdf:.0f} FC",
+                f"{total_cdf:.0f} FC",
+                f"{total_usd:.2f} $" # Affichage en USD (2 décimales)
+            ])
+
+    # Ligne du total (pour les deux devises)
+    return rapport.terminer(["", "", "", "TOTAL GÉNÉRAL :",
+                             f"{total_general_cdf:.0f} FC", # Total en CDF (Base)
+                             f"{total_general_usd:.2f} $"]) # Total converti en USD
+
+
+def generer_rapport_stock_pdf(db, filename, date_debut=None, date_fin=None):
+    """Génère le PDF du journal des entrées de stock en lisant le journal par lots. Retourne le nombre d'entrées."""
+    importer_reportlab()
+    rapport = RapportPDFFlux(
+        filename, "JOURNAL DES ENTRÉES DE STOCK",
+        [f"Période filtrée : {date_debut or 'Début'} à {date_fin or 'Fin'}",
+         f"Généré par le système le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"],
+        ["Date d'Entrée", "Produit", "Quantité Ajoutée"],
+        [1.5*inch, 3*inch, 1.5*inch],
+    )
+    total_ajoute = 0 
+
+    # Chaque lot contient des lignes (date_entree, nom, quantite_ajoutee)
+    for lot in db.iterer_journal_stock(date_debut, date_fin):
+        for date_entree, nom, quantite_ajoutee in lot:
+            rapport.ajouter_ligne([date_entree, nom, quantite_ajoutee])
+            total_ajoute += quantite_ajoutee
+
+    # Ligne du total
+    return rapport.terminer(["", "TOTAL ARTICLES AJOUTÉS :", total_ajoute])
+
+# --- PARTIE 5 : LIGNE DE COMMANDE (mode sans interface) ---
+def commande_rapport(args):
+    db = ouvrir_base(args.db, args.profil, args.caisse, args.serveur, args.jeton)
+    horodatage = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if args.type == "ventes":
+        sortie = args.out or f"Rapport_Ventes_{horodatage}.pdf"
+        nb_lignes = generer_rapport_ventes_pdf(db, sortie, args.date_debut, args.date_fin, args.titre)
+    else:
+        sortie = args.out or f"Journal_Stock_{horodatage}.pdf"
+        nb_lignes = generer_rapport_stock_pdf(db, sortie, args.date_debut, args.date_fin)
+    db.conn.close()
+    print(f"Rapport généré : {sortie} ({nb_lignes} ligne(s))")
+    return 0
+
+
+def commande_maintenance(args):
+    db = GestionBaseDeDonnees(args.db, profil=args.profil) # L'ouverture applique aussi les migrations
+    try:
+        if args.action == "resume":
+            db.reconstruire_resume_ventes()
+            print("Résumé journalier des ventes recalculé.")
+        elif args.action == "sauvegarde":
+            backup_path = db.sauvegarder_bdd(progression=afficher_progression_sauvegarde, conserver=args.conserver)
+            print(file=sys.stderr)
+            if not backup_path:
+                return 1
+            print(f"Base de données sauvegardée dans : {backup_path}")
+        else:
+            print("Schéma de la base à jour.")
+        return 0
+    finally:
+        db.conn.close()
+
+
+def afficher_progression_sauvegarde(etape, fraction):
+    """Progression d'une sauvegarde sur la sortie d'erreur (la ligne est réécrite à chaque étape)."""
+    print(f"\rSauvegarde : {etape} {fraction:.0%}   ", end="", file=sys.stderr, flush=True)
+
+
+def afficher_progression(nb_lignes, fraction=None):
+    """Progression d'un import/export sur la sortie d'erreur (la ligne est réécrite à chaque lot)."""
+    pourcentage = f" ({fraction:.0%})" if fraction is not None else ""
+    print(f"\r{nb_lignes} ligne(s) traitée(s){pourcentage}", end="", file=sys.stderr, flush=True)
+
+
+def commande_import(args):
+    db = GestionBaseDeDonnees(args.db, profil=args.profil)
+    try:
+        succes, message = db.importer_produits_csv(args.fichier, progression=afficher_progression)
+        print(file=sys.stderr)
+        print(message)
+        return 0 if succes else 1
+    finally:
+        db.conn.close()
+
+
+def commande_export(args):
+    db = GestionBaseDeDonnees(args.db, profil=args.profil)
+    try:
+        sortie = args.out or f"{args.table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        nb_lignes = db.exporter_csv(args.table, sortie, args.date_debut, args.date_fin, progression=afficher_progression)
+        print(file=sys.stderr)
+        print(f"Export terminé : {sortie} ({nb_lignes} ligne(s))")
+        return 0
+    finally:
+        db.conn.close()
+
+
+def travailleur_stress(db_name, profil, nb_operations, produits, graine):
+    """
+    Processus du test de concurrence : paniers aléatoires (1 à 3 lignes) et quelques réceptions,
+    tous sur les mêmes produits. Retourne ce que ce processus croit avoir vendu et reçu.
+    """
+    rng = random.Random(graine)
+    db = GestionBaseDeDonnees(db_name, profil=profil, caisse_id=f"stress-{graine}")
+    vendu = dict.fromkeys(produits, 0)
+    recu = dict.fromkeys(produits, 0)
+    refus = verrous = 0
+    for _ in range(nb_operations):
+        try:
+            if rng.random() < 0.1:
+                produit_id, quantite = rng.choice(produits), rng.randint(1, 5)
+                succes, message = db.enregistrer_reception([(produit_id, quantite)])
+                if succes:
+                    recu[produit_id] += quantite
+                continue
+            panier = {produit_id: rng.randint(1, 3) for produit_id in rng.sample(produits, rng.randint(1, min(3, len(produits))))}
+            succes, resultats = db.faire_vente_panier(panier)
+            if succes:
+                for produit_id, quantite in panier.items():
+                    vendu[produit_id] += quantite
+            else:
+                refus += 1 # Stock insuffisant : toute la vente est refusée
+        except sqlite3.OperationalError:
+            verrous += 1 # Base toujours verrouillée après tous les essais
+    db.conn.close()
+    return vendu, recu, refus, verrous, db.nb_attentes_verrou, db.nb_reessais_verrou
+
+
+def commande_stress(args):
+    """Plusieurs processus vendent les mêmes produits sur une base temporaire, puis on vérifie les stocks."""
+    dossier = tempfile.mkdtemp(prefix="stress_magasin_")
+    db_name = os.path.join(dossier, "stress.db")
+    db = GestionBaseDeDonnees(db_name, profil=args.profil)
+    for i in range(args.produits):
+        db.ajouter_produit(f"Produit stress {i}", 100, args.stock, "Stress")
+    produits = [produit[0] for produit in db.recuperer_produits()]
+    db.conn.close() # Pas de connexion ouverte pendant la création des processus
+
+    debut = time.perf_counter()
+    with multiprocessing.Pool(args.processus) as pool:
+        bilans = pool.starmap(travailleur_stress, [(db_name, args.profil, args.operations, produits, graine)
+                                                   for graine in range(args.processus)])
+    duree = time.perf_counter() - debut
+
+    vendu = dict.fromkeys(produits, 0)
+    recu = dict.fromkeys(produits, 0)
+    for vendu_processus, recu_processus, *_ in bilans:
+        for produit_id in produits:
+            vendu[produit_id] += vendu_processus[produit_id]
+            recu[produit_id] += recu_processus[produit_id]
+    refus = sum(bilan[2] for bilan in bilans)
+    verrous = sum(bilan[3] for bilan in bilans)
+    attentes = sum(bilan[4] for bilan in bilans)
+    reessais = sum(bilan[5] for bilan in bilans)
+
+    # Vérification : aucun stock négatif, et base cohérente avec ce que les processus ont enregistré
+    db = GestionBaseDeDonnees(db_name, profil=args.profil)
+    erreurs = []
+    for produit_id in produits:
+        db.cursor.execute("SELECT quantite FROM produits WHERE id = ?", (produit_id,))
+        stock = db.cursor.fetchone()[0]
+        db.cursor.execute("SELECT COALESCE(SUM(quantite), 0) FROM ventes WHERE produit_id = ?", (produit_id,))
+        vendu_bdd = db.cursor.fetchone()[0]
+        db.cursor.execute("SELECT COALESCE(SUM(quantite_ajoutee), 0) FROM journal_stock WHERE produit_id = ?", (produit_id,))
+        recu_bdd = db.cursor.fetchone()[0]
+        if stock < 0:
+            erreurs.append(f"Produit {produit_id} : survente (stock {stock})")
+        if stock != args.stock + recu[produit_id] - vendu[produit_id] or vendu_bdd != vendu[produit_id] or recu_bdd != recu[produit_id]:
+            erreurs.append(f"Produit {produit_id} : stock {stock}, vendu {vendu_bdd} (attendu {vendu[produit_id]}), "
+                           f"reçu {recu_bdd} (attendu {recu[produit_id]})")
+    # Chaque vente est attribuée à la caisse (processus) qui l'a faite
+    db.cursor.execute("SELECT caisse_id, SUM(quantite) FROM ventes GROUP BY caisse_id")
+    vendu_par_caisse = dict(db.cursor.fetchall())
+    for graine, bilan in enumerate(bilans):
+        if vendu_par_caisse.get(f"stress-{graine}", 0) != sum(bilan[0].values()):
+            erreurs.append(f"Caisse stress-{graine} : {vendu_par_caisse.get(f'stress-{graine}', 0)} unité(s) en base, "
+                           f"{sum(bilan[0].values())} attendue(s)")
+    db.conn.close()
+
+    nb_operations = args.processus * args.operations
+    print(f"{nb_operations} opération(s) en {duree:.2f} s ({nb_operations / duree:.0f}/s) sur {args.processus} processus")
+    print(f"Unités vendues : {sum(vendu.values())}, reçues : {sum(recu.values())}, "
+          f"ventes refusées (stock insuffisant) : {refus}")
+    print(f"Attentes de verrou : {attentes}, nouvelles tentatives : {reessais}, échecs (base verrouillée) : {verrous}")
+    if args.garder:
+        print(f"Base conservée : {db_name}")
+    else:
+        shutil.rmtree(dossier, ignore_errors=True)
+    if erreurs:
+        print("ÉCHEC :\n" + "\n".join(erreurs))
+        return 1
+    print("OK : aucune survente, stocks cohérents avec les ventes et réceptions enregistrées.")
+    return 0
+
+
+# Magasins synthétiques du banc d'essai : {taille: (produits, ventes, entrées du journal de stock)}
+TAILLES_BENCH = {
+    "petite": (1_000, 10_000, 1_000),
+    "moyenne": (10_000, 100_000, 10_000),
+    "grande": (10_000, 1_000_000, 100_000),
+}
+SEUIL_REGRESSION = 0.25 # Écart relatif de la médiane au-delà duquel une mesure est signalée
+PLANCHER_REGRESSION_MS = 0.05 # Écarts absolus plus petits ignorés (bruit de mesure)
+MOTS_BENCH = ["riz", "savon", "huile", "sucre", "lait", "thé", "sel", "farine", "café", "pâtes"]
+
+
+def generer_magasin_synthetique(db, nb_produits, nb_ventes, nb_entrees, graine=0, taille_lot=50_000, stock=1_000_000):
+    """
+    Remplit une base vide : produits, ventes et entrées de stock réparties sur l'année écoulée,
+    en une transaction et par lots. Les lignes sont générées dans l'ordre chronologique, comme dans
+    un vrai magasin (les index sur les dates sont remplis par la fin). Le résumé journalier des ventes
+    est recalculé à la fin.
+    """
+    rng = random.Random(graine)
+    debut_annee = time.time() - 365 * 86400
+
+    def date_numero(numero, nb_lignes):
+        # numero-ième de nb_lignes dates réparties régulièrement sur l'année, avec un peu d'aléa
+        return datetime.fromtimestamp(debut_annee + (numero + rng.random()) * 365 * 86400 / nb_lignes).strftime(
+            "%Y-%m-%d %H:%M:%S")
+
+    produits = [(f"{rng.choice(MOTS_BENCH).capitalize()} {rng.choice(MOTS_BENCH)} {i}", rng.randint(1, 500) * 100,
+                 stock, f"Catégorie {i % 20}", f"200{i:09d}") for i in range(nb_produits)]
+    try:
+        db.debut_transaction_ecriture()
+        db.cursor.executemany("INSERT INTO produits (nom, prix, quantite, categorie, code_barre) VALUES (?, ?, ?, ?, ?)",
+                              produits)
+        for debut in range(0, nb_ventes, taille_lot):
+            lot = []
+            for numero in range(debut, min(debut + taille_lot, nb_ventes)):
+                i = rng.randrange(nb_produits)
+                lot.append((i + 1, rng.randint(1, 5), date_numero(numero, nb_ventes), produits[i][1], produits[i][0],
+                            f"caisse-{i % 4}"))
+            db.cursor.executemany("INSERT INTO ventes (produit_id, quantite, date_vente, prix_unitaire, nom_produit, caisse_id) "
+                                  "VALUES (?, ?, ?, ?, ?, ?)", lot)
+        for debut in range(0, nb_entrees, taille_lot):
+            lot = [(rng.randrange(nb_produits) + 1, rng.randint(1, 100), date_numero(numero, nb_entrees))
+                   for numero in range(debut, min(debut + taille_lot, nb_entrees))]
+            db.cursor.executemany("INSERT INTO journal_stock (produit_id, quantite_ajoutee, date_entree) VALUES (?, ?, ?)", lot)
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    db.reconstruire_resume_ventes()
+    db.catalogue.invalider()
+
+
+def mesurer(fonction, repetitions):
+    """Durées de repetitions appels de fonction() en ms : médiane, minimum et moyenne."""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+    return {"mediane_ms": round(durees[len(durees) // 2], 4), "min_ms": round(durees[0], 4),
+            "moyenne_ms": round(sum(durees) / len(durees), 4), "repetitions": repetitions}
+
+
+def banc_essai(db, repetitions):
+    """
+    Mesure les méthodes de GestionBaseDeDonnees sur une base remplie : lectures d'abord, puis écritures
+    (qui modifient la base) et sauvegarde. Les parcours complets sont répétés 10 fois moins souvent.
+    """
+    rng = random.Random(1)
+    nb_produits = len(db.recuperer_produits())
+    mois = datetime.fromtimestamp(time.time() - 30 * 86400).strftime("%Y-%m-%d")
+    lourdes = max(3, repetitions // 10)
+    sauvegardes = []
+
+    def catalogue_froid():
+        db.catalogue.invalider()
+        db.recuperer_catalogue()
+
+    operations = [
+        ("recuperer_catalogue (froid)", catalogue_froid, lourdes),
+        ("rechercher_produits", lambda: db.rechercher_produits(rng.choice(MOTS_BENCH)[:3]), repetitions),
+        ("trouver_par_code", lambda: db.trouver_par_code(f"200{rng.randrange(nb_produits):09d}"), repetitions),
+        ("recuperer_ventes", lambda: db.recuperer_ventes(), lourdes),
+        ("recuperer_ventes (30 jours)", lambda: db.recuperer_ventes(mois), lourdes),
+        ("recuperer_ventes_page", lambda: db.recuperer_ventes_page(), repetitions),
+        ("calculer_total_ventes (30 jours)", lambda: db.calculer_total_ventes(mois), repetitions),
+        ("recuperer_resume_ventes (mois)", lambda: db.recuperer_resume_ventes(granularite="mois"), repetitions),
+        ("recuperer_journal_stock", lambda: db.recuperer_journal_stock(), lourdes),
+        ("recuperer_journal_stock (30 jours)", lambda: db.recuperer_journal_stock(mois), lourdes),
+        ("faire_une_vente", lambda: db.faire_une_vente(rng.randint(1, nb_produits), 1), repetitions),
+        ("faire_vente_panier (3 lignes)",
+         lambda: db.faire_vente_panier({rng.randint(1, nb_produits): 1 for _ in range(3)}), repetitions),
+        ("enregistrer_entree_stock", lambda: db.enregistrer_entree_stock(rng.randint(1, nb_produits), 10), repetitions),
+        ("sauvegarder_bdd", lambda: sauvegardes.append(db.sauvegarder_bdd()), lourdes),
+    ]
+    mesures = {}
+    for nom, fonction, nb in operations:
+        mesures[nom] = mesurer(fonction, nb)
+        print(f"  {nom:<36} {mesures[nom]['mediane_ms']:>10.3f} ms (médiane de {nb})", file=sys.stderr)
+    for chemin in sauvegardes:
+        if chemin and os.path.exists(chemin): # Les plus anciennes ont pu être purgées entre-temps
+            os.remove(chemin)
+    return mesures
+
+
+def comparer_bench(chemin_avant, chemin_apres, seuil=SEUIL_REGRESSION):
+    """Compare les médianes de deux fichiers de résultats ; retourne 1 si une mesure a régressé."""
+    with open(chemin_avant, encoding="utf-8") as fichier:
+        avant = json.load(fichier)
+    with open(chemin_apres, encoding="utf-8") as fichier:
+        apres = json.load(fichier)
+    if (avant.get("machine"), avant.get("sqlite")) != (apres.get("machine"), apres.get("sqlite")):
+        print("Attention : les deux séries n'ont pas été mesurées sur la même machine / version de SQLite.")
+
+    regressions = 0
+    print(f"{'Taille':<8} {'Mesure':<36} {'Avant ms':>10} {'Après ms':>10} {'Ratio':>7}")
+    for taille, resultat in apres["tailles"].items():
+        reference = avant["tailles"].get(taille)
+        if reference is None:
+            continue
+        for nom, mesure in resultat["mesures"].items():
+            if nom not in reference["mesures"]:
+                continue
+            t_avant, t_apres = reference["mesures"][nom]["mediane_ms"], mesure["mediane_ms"]
+            etat = ""
+            if t_apres > t_avant * (1 + seuil) and t_apres - t_avant > PLANCHER_REGRESSION_MS:
+                etat = "RÉGRESSION"
+                regressions += 1
+            elif t_avant > t_apres * (1 + seuil) and t_avant - t_apres > PLANCHER_REGRESSION_MS:
+                etat = "amélioration"
+            ratio = f"{t_apres / t_avant:.2f}x" if t_avant else "-"
+            print(f"{taille:<8} {nom:<36} {t_avant:>10.3f} {t_apres:>10.3f} {ratio:>7}  {etat}")
+    if regressions:
+        print(f"{regressions} régression(s) au-delà de {seuil:.0%}.")
+        return 1
+    print(f"Aucune régression au-delà de {seuil:.0%}.")
+    return 0
+
+
+def commande_bench(args):
+    """Banc d'essai de la couche base de données sur des magasins synthétiques (bases temporaires)."""
+    if args.action == "comparer":
+        if len(args.fichiers) != 2:
+            print("Usage : bench comparer AVANT.json APRES.json")
+            return 2
+        return comparer_bench(*args.fichiers, seuil=args.seuil)
+
+    tailles = args.tailles.split(",")
+    inconnues = [taille for taille in tailles if taille not in TAILLES_BENCH]
+    if inconnues:
+        print(f"Taille(s) inconnue(s) : {', '.join(inconnues)} (choix : {', '.join(TAILLES_BENCH)})")
+        return 2
+
+    resultats = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "profil": args.profil,
+        "tailles": {},
+    }
+    dossier = tempfile.mkdtemp(prefix="bench_magasin_")
+    repertoire_initial = os.getcwd()
+    try:
+        os.chdir(dossier) # sauvegarder_bdd écrit dans ./backups
+        for taille in tailles:
+            nb_produits, nb_ventes, nb_entrees = TAILLES_BENCH[taille]
+            db_name = os.path.join(dossier, f"{taille}.db")
+            db = GestionBaseDeDonnees(db_name, profil=args.profil, caisse_id="bench")
+            debut = time.perf_counter()
+            generer_magasin_synthetique(db, nb_produits, nb_ventes, nb_entrees)
+            print(f"[{taille}] {nb_produits} produits, {nb_ventes} ventes, {nb_entrees} entrées générés "
+                  f"en {time.perf_counter() - debut:.1f} s", file=sys.stderr)
+            mesures = banc_essai(db, args.repetitions)
+            db.conn.close()
+            resultats["tailles"][taille] = {
+                "produits": nb_produits, "ventes": nb_ventes, "journal_stock": nb_entrees,
+                "taille_fichier_mo": round(os.path.getsize(db_name) / 1e6, 1), "mesures": mesures,
+            }
+    finally:
+        os.chdir(repertoire_initial)
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    sortie = args.out or f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(sortie, "w", encoding="utf-8") as fichier:
+        json.dump(resultats, fichier, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans : {sortie}")
+    return 0
+
+
+def travailleur_caisse(db_name, profil, duree, reflexion, nb_produits, graine):
+    """
+    Processus du test de charge : une caisse qui encaisse des paniers aléatoires (1 à 5 lignes,
+    la moitié sur 10 produits vedettes) séparés par un temps de réflexion aléatoire de moyenne
+    reflexion secondes, pendant duree secondes. Retourne les latences et ce qu'elle croit avoir vendu.
+    """
+    rng = random.Random(graine)
+    db = GestionBaseDeDonnees(db_name, profil=profil, caisse_id=f"charge-{graine}")
+    latences = []
+    vendu = {}
+    refus = verrous = 0
+    fin = time.perf_counter() + duree
+    while True:
+        if reflexion > 0:
+            time.sleep(rng.expovariate(1 / reflexion))
+        if time.perf_counter() >= fin:
+            break
+        panier = {}
+        for _ in range(rng.choice((1, 1, 2, 2, 3, 4, 5))):
+            produit_id = rng.randint(1, min(10, nb_produits)) if rng.random() < 0.5 else rng.randint(1, nb_produits)
+            panier[produit_id] = panier.get(produit_id, 0) + rng.randint(1, 3)
+        debut = time.perf_counter()
+        try:
+            succes, resultats = db.faire_vente_panier(panier)
+        except sqlite3.OperationalError:
+            verrous += 1 # Base toujours verrouillée après tous les essais
+            continue
+        latences.append((time.perf_counter() - debut) * 1000)
+        if succes:
+            for produit_id, quantite in panier.items():
+                vendu[produit_id] = vendu.get(produit_id, 0) + quantite
+        else:
+            refus += 1
+    db.conn.close()
+    return latences, vendu, refus, verrous, db.nb_attentes_verrou, db.temps_attente_verrou, db.nb_reessais_verrou
+
+
+def travailleur_rapports(db_name, profil, duree, intervalle):
+    """
+    Processus du test de charge : le gérant consulte ses rapports pendant que les caisses encaissent
+    (totaux du jour, historique, résumé par catégorie, parcours complet des ventes du jour, journal).
+    Retourne les latences en ms.
+    """
+    db = GestionBaseDeDonnees(db_name, profil=profil)
+    aujourd_hui = datetime.now().strftime("%Y-%m-%d")
+    latences = []
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin:
+        debut = time.perf_counter()
+        db.calculer_total_ventes(aujourd_hui, aujourd_hui)
+        db.recuperer_ventes_page(limite=ApplicationEcommerce.TAILLE_PAGE_HISTORIQUE)
+        db.recuperer_resume_ventes(granularite="mois", par_categorie=True)
+        for _ in db.iterer_ventes(aujourd_hui, aujourd_hui):
+            pass
+        db.recuperer_journal_stock()
+        latences.append((time.perf_counter() - debut) * 1000)
+        time.sleep(intervalle)
+    db.conn.close()
+    return latences
+
+
+def palier_charge(args, nb_caisses, dossier):
+    """Un palier du test de charge sur une base neuve ; retourne (ligne de résumé, erreurs)."""
+    db_name = os.path.join(dossier, f"charge_{nb_caisses}.db")
+    db = GestionBaseDeDonnees(db_name, profil=args.profil)
+    generer_magasin_synthetique(db, args.produits, args.historique, 0, stock=args.stock)
+    stocks_initiaux = {produit[0]: produit[3] for produit in db.recuperer_produits()}
+    db.conn.close() # Pas de connexion ouverte pendant la création des processus
+
+    with multiprocessing.Pool(nb_caisses + 1) as pool:
+        rapports = pool.apply_async(travailleur_rapports, (db_name, args.profil, args.duree, args.intervalle_rapports))
+        bilans = pool.starmap(travailleur_caisse, [(db_name, args.profil, args.duree, args.reflexion, args.produits, graine)
+                                                    for graine in range(nb_caisses)])
+        latences_rapports = sorted(rapports.get())
+
+    latences = sorted(latence for bilan in bilans for latence in bilan[0])
+    vendu = {}
+    for bilan in bilans:
+        for produit_id, quantite in bilan[1].items():
+            vendu[produit_id] = vendu.get(produit_id, 0) + quantite
+    refus = sum(bilan[2] for bilan in bilans)
+    verrous = sum(bilan[3] for bilan in bilans)
+    attentes = sum(bilan[4] for bilan in bilans)
+    temps_attente = sum(bilan[5] for bilan in bilans)
+    reessais = sum(bilan[6] for bilan in bilans)
+
+    # Surventes : stock négatif, ou base en désaccord avec ce que les caisses ont encaissé
+    db = GestionBaseDeDonnees(db_name, profil=args.profil)
+    db.cursor.execute("SELECT produit_id, SUM(quantite) FROM ventes WHERE caisse_id LIKE 'charge-%' GROUP BY produit_id")
+    vendu_bdd = dict(db.cursor.fetchall())
+    erreurs = []
+    for produit_id, stock in ((produit[0], produit[3]) for produit in db.recuperer_produits()):
+        if stock < 0:
+            erreurs.append(f"{nb_caisses} caisse(s), produit {produit_id} : survente (stock {stock})")
+        elif stock != stocks_initiaux[produit_id] - vendu.get(produit_id, 0) or vendu_bdd.get(produit_id, 0) != vendu.get(produit_id, 0):
+            erreurs.append(f"{nb_caisses} caisse(s), produit {produit_id} : stock {stock}, vendu {vendu_bdd.get(produit_id, 0)} "
+                           f"(encaissé {vendu.get(produit_id, 0)})")
+    db.conn.close()
+
+    encaissements = len(latences) - refus
+    print(f"\n{nb_caisses} caisse(s) pendant {args.duree:g} s : {len(latences)} panier(s), {encaissements} encaissé(s) "
+          f"({encaissements / args.duree:.1f}/s), {refus} refusé(s) (stock insuffisant), {verrous} échec(s) base verrouillée")
+    print(f"  Latence d'encaissement : p50 {centile(latences, 50):.1f} ms, p95 {centile(latences, 95):.1f} ms, "
+          f"p99 {centile(latences, 99):.1f} ms, max {latences[-1] if latences else 0:.1f} ms")
+    print(f"  Attentes de verrou : {attentes} ({temps_attente:.2f} s au total), nouvelles tentatives : {reessais}")
+    print(f"  Rapports du gérant : {len(latences_rapports)}, p50 {centile(latences_rapports, 50):.0f} ms, "
+          f"p95 {centile(latences_rapports, 95):.0f} ms")
+    print(f"  Surventes / incohérences : {len(erreurs)}")
+    resume = (f"{nb_caisses:>7} {encaissements / args.duree:>10.1f} {centile(latences, 50):>8.1f} {centile(latences, 95):>8.1f} "
+              f"{centile(latences, 99):>8.1f} {attentes:>8} {verrous:>7} {len(erreurs):>9}")
+    return resume, erreurs
+
+
+def commande_charge(args):
+    """
+    Test de charge : N caisses (processus) encaissent avec des temps de réflexion pendant qu'un processus
+    gérant consulte des rapports, sur une base temporaire préremplie. Plusieurs paliers possibles
+    (--caisses 1,2,4,8) pour trouver combien de caisses une base supporte.
+    """
+    paliers = [int(nombre) for nombre in args.caisses.split(",")]
+    dossier = tempfile.mkdtemp(prefix="charge_magasin_")
+    resumes = []
+    erreurs = []
+    try:
+        for nb_caisses in paliers:
+            resume, erreurs_palier = palier_charge(args, nb_caisses, dossier)
+            resumes.append(resume)
+            erreurs.extend(erreurs_palier)
+    finally:
+        if args.garder:
+            print(f"\nBases conservées dans : {dossier}")
+        else:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+    print(f"\n{'Caisses':>7} {'Ventes/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Attentes':>8} {'Échecs':>7} {'Surventes':>9}")
+    print("\n".join(resumes))
+    if erreurs:
+        print("ÉCHEC :\n" + "\n".join(erreurs))
+        return 1
+    print("OK : aucune survente, stocks cohérents avec les encaissements.")
+    return 0
+
+
+def adresse_locale(hote):
+    """Vrai si une écoute sur hote n'est joignable que depuis ce poste (127.0.0.1, ::1, localhost)."""
+    if hote == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(hote).is_loopback
+    except ValueError:
+        return False # Nom de machine, "" (toutes les interfaces)...
+
+
+def commande_serveur(args):
+    """Sert la base aux caisses du réseau local jusqu'à Ctrl+C."""
+    jeton = args.jeton
+    if not jeton and not adresse_locale(args.hote):
+        # Sans jeton, n'importe quel poste du réseau pourrait créer un compte Gérant ou essayer des mots de passe
+        jeton = secrets.token_urlsafe(16)
+        print(f"Écoute sur le réseau sans --jeton : jeton généré {jeton} (à donner aux caisses avec --jeton).",
+              flush=True)
+    serveur = ServeurBaseDeDonnees(args.db, profil=args.profil, caisse_id=args.caisse,
+                                   taille_pool=args.connexions, jeton=jeton)
+    serveur_http = serveur.creer_serveur_http(args.hote, args.port)
+    hote, port = serveur_http.server_address[:2]
+    print(f"Serveur de caisses : http://{hote}:{port}/rpc (base {args.db}, {args.connexions} connexion(s)). "
+          f"Ctrl+C pour arrêter.", flush=True)
+    try:
+        serveur_http.serve_forever()
+    except KeyboardInterrupt:
+        print("Arrêt du serveur.")
+    finally:
+        serveur_http.server_close()
+        serveur.arreter()
+    return 0
+
+
+def date_iso(texte):
+    """Type argparse des options --from/--to : date YYYY-MM-DD valide (une date invalide est une erreur d'usage)."""
+    try:
+        return datetime.strptime(texte, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"date invalide : {texte!r} (format attendu YYYY-MM-DD)")
+
+
+def construire_parseur():
+    parser = argparse.ArgumentParser(
+        description="Logiciel Gestion E-Commerce. Sans commande : lance l'interface graphique.")
+    parser.add_argument("--db", default="mon_magasin.db", help="Fichier de base de données SQLite")
+    parser.add_argument("--profil", default="rapide", choices=sorted(GestionBaseDeDonnees.PROFILS_CONNEXION),
+                        help="Profil de connexion SQLite")
+    parser.add_argument("--caisse", help="Identifiant de cette caisse, enregistré sur chaque vente (défaut : nom du poste)")
+    parser.add_argument("--serveur", help="Utiliser la base d'un serveur de caisses (HOTE:PORT) au lieu de --db "
+                                          "(interface graphique et rapports)")
+    parser.add_argument("--jeton", help="Jeton partagé entre le serveur de caisses et ses clients")
+    parser.add_argument("--instrumenter", action="store_true",
+                        help="Chronométrer les requêtes SQL (panneau Administration, résumé en fin de commande)")
+    parser.add_argument("--seuil-lent", type=float, default=100,
+                        help="Avec --instrumenter : durée (ms) au-delà de laquelle une requête est signalée avec son plan")
+    parser.add_argument("--profil-ui", action="store_true",
+                        help="Mesurer les rappels de l'interface (temps base / widgets) et les blocages de la fenêtre ; "
+                             "rapport à la fermeture")
+    parser.add_argument("--profil-ui-sortie",
+                        help="Avec --profil-ui : fichier du rapport (.csv) ou du profil cProfile des rappels (.prof)")
+    parser.add_argument("--chrono", action="store_true",
+                        help="Affiche les temps de démarrage (imports, construction de la fenêtre)")
+    commandes = parser.add_subparsers(dest="commande")
+    base_locale = "lancez-la sur le poste du serveur avec --db"
+    base_temporaire = "elle travaille sur une base temporaire"
+
+    rapport = commandes.add_parser("report", help="Générer un rapport PDF sans interface")
+    rapport.add_argument("type", choices=["ventes", "stock"])
+    rapport.add_argument("--from", dest="date_debut", type=date_iso, help="Date de début (YYYY-MM-DD)")
+    rapport.add_argument("--to", dest="date_fin", type=date_iso, help="Date de fin (YYYY-MM-DD)")
+    rapport.add_argument("--out", help="Fichier PDF de sortie")
+    rapport.add_argument("--titre", default="Rapport de Ventes", help="Titre du rapport de ventes")
+    rapport.set_defaults(fonction=commande_rapport)
+
+    maintenance = commandes.add_parser("maintenance", help="Tâches de maintenance de la base")
+    maintenance.add_argument("action", choices=["migrer", "resume", "sauvegarde"],
+                             help="migrer : mise à niveau du schéma ; resume : recalcul du résumé des ventes ; "
+                                  "sauvegarde : copie compressée dans backups/")
+    maintenance.add_argument("--conserver", type=int, default=GestionBaseDeDonnees.NB_SAUVEGARDES_CONSERVEES,
+                             help="Sauvegardes gardées dans backups/ après une sauvegarde (0 : aucune suppression)")
+    maintenance.set_defaults(sans_serveur=base_locale, fonction=commande_maintenance)
+
+    importer = commandes.add_parser("import", help="Importer des produits depuis un fichier CSV")
+    importer.add_argument("table", choices=["produits"])
+    importer.add_argument("fichier", help="Fichier CSV (colonnes nom, prix, quantite, categorie, code_barre, id)")
+    importer.set_defaults(sans_serveur=base_locale, fonction=commande_import)
+
+    exporter = commandes.add_parser("export", help="Exporter une table en CSV")
+    exporter.add_argument("table", choices=sorted(GestionBaseDeDonnees.EXPORTS_CSV))
+    exporter.add_argument("--from", dest="date_debut", type=date_iso,
+                          help="Date de début (YYYY-MM-DD), ventes et journal_stock")
+    exporter.add_argument("--to", dest="date_fin", type=date_iso,
+                          help="Date de fin (YYYY-MM-DD), ventes et journal_stock")
+    exporter.add_argument("--out", help="Fichier CSV de sortie")
+    exporter.set_defaults(sans_serveur=base_locale, fonction=commande_export)
+
+    stress = commandes.add_parser("stress", help="Test de concurrence : plusieurs processus vendent les mêmes produits "
+                                                 "(base temporaire, --db ignoré)")
+    stress.add_argument("--processus", type=int, default=4, help="Nombre de processus (caisses)")
+    stress.add_argument("--operations", type=int, default=500, help="Opérations par processus")
+    stress.add_argument("--produits", type=int, default=3, help="Nombre de produits partagés")
+    stress.add_argument("--stock", type=int, default=500, help="Stock initial de chaque produit")
+    stress.add_argument("--garder", action="store_true", help="Conserver la base temporaire après le test")
+    stress.set_defaults(sans_serveur=base_temporaire, fonction=commande_stress)
+
+    serveur = commandes.add_parser("serveur", help="Servir la base (--db) aux caisses du réseau local en JSON sur HTTP")
+    serveur.add_argument("--hote", default="127.0.0.1",
+                         help="Adresse d'écoute (0.0.0.0 pour accepter les autres postes du réseau ; "
+                              "un jeton est alors généré si --jeton n'est pas donné)")
+    serveur.add_argument("--port", type=int, default=PORT_SERVEUR, help="Port d'écoute (0 : port libre)")
+    serveur.add_argument("--connexions", type=int, default=4, help="Taille du pool de connexions SQLite")
+    serveur.set_defaults(sans_serveur=base_locale, fonction=commande_serveur)
+
+    bench = commandes.add_parser("bench", help="Banc d'essai de la base sur des magasins synthétiques "
+                                               "(bases temporaires, --db ignoré)")
+    bench.add_argument("action", choices=["lancer", "comparer"],
+                       help="lancer : mesurer et écrire un fichier JSON ; comparer AVANT.json APRES.json")
+    bench.add_argument("fichiers", nargs="*", help="Fichiers de résultats à comparer")
+    bench.add_argument("--tailles", default="petite,moyenne",
+                       help=f"Tailles de magasin séparées par des virgules ({', '.join(TAILLES_BENCH)})")
+    bench.add_argument("--repetitions", type=int, default=50, help="Répétitions des mesures courtes")
+    bench.add_argument("--out", help="Fichier JSON de résultats")
+    bench.add_argument("--seuil", type=float, default=SEUIL_REGRESSION,
+                       help="Écart relatif signalé comme régression par comparer (0.25 = +25 %%)")
+    bench.set_defaults(sans_serveur=base_temporaire, fonction=commande_bench)
+
+    charge = commandes.add_parser("charge", help="Test de charge : caisses simultanées avec temps de réflexion et "
+                                                 "rapports du gérant (base temporaire, --db ignoré)")
+    charge.add_argument("--caisses", default="4", help="Nombre de caisses, ou paliers séparés par des virgules (1,2,4,8)")
+    charge.add_argument("--duree", type=float, default=30, help="Durée de chaque palier en secondes")
+    charge.add_argument("--reflexion", type=float, default=0.5,
+                        help="Temps de réflexion moyen entre deux paniers d'une caisse, en secondes (0 : aucun)")
+    charge.add_argument("--intervalle-rapports", type=float, default=2,
+                        help="Pause du gérant entre deux séries de rapports, en secondes")
+    charge.add_argument("--produits", type=int, default=1000, help="Nombre de produits")
+    charge.add_argument("--stock", type=int, default=200, help="Stock initial de chaque produit")
+    charge.add_argument("--historique", type=int, default=50_000, help="Ventes déjà présentes dans la base")
+    charge.add_argument("--garder", action="store_true", help="Conserver les bases temporaires après le test")
+    charge.set_defaults(sans_serveur=base_temporaire, fonction=commande_charge)
+    return parser
+
+
+def lancer_interface_graphique(args):
+    debut = time.perf_counter()
+    importer_interface_graphique()
+    if args.chrono:
+        afficher_chrono("import tkinter/customtkinter", debut)
+
     # Configurer l'apparence par défaut (Style bleu CustomTkinter)
     ctk.set_appearance_mode("System")  # Modes: "System", "Dark", "Light"
     ctk.set_default_color_theme("blue")  # Thèmes: "blue", "green", "dark-blue"
 
+    debut = time.perf_counter()
     root = ctk.CTk()
-    app = ApplicationEcommerce(root)
-    root.mainloop()
\ No newline at end of file
+    profileur = ProfileurInterface(args.profil_ui_sortie) if args.profil_ui else None
+    app = ApplicationEcommerce(root, args.db, args.profil, args.caisse, args.serveur, args.jeton, profileur)
+    if args.chrono:
+        root.update() # Premier affichage complet de la fenêtre de connexion
+        afficher_chrono("construction de la fenêtre", debut)
+        afficher_chrono("démarrage total (jusqu'à la fenêtre)", DEBUT_CHRONO)
+    root.mainloop()
+
+
+def afficher_statistiques_requetes(nb_lignes=15):
+    """Mode --instrumenter : méthodes les plus coûteuses en temps SQL, sur la sortie d'erreur."""
+    lignes, lentes = STATISTIQUES_REQUETES.instantane()
+    print(f"\n{'Méthode':<40} {'Appels':>8} {'Total ms':>10} {'Moy. ms':>9} {'p95 ms':>9} {'Max ms':>9}", file=sys.stderr)
+    for methode, appels, total, moyenne, p95, maximum, histogramme in lignes[:nb_lignes]:
+        print(f"{methode:<40} {appels:>8} {total:>10.1f} {moyenne:>9.3f} {p95:>9.3f} {maximum:>9.1f}", file=sys.stderr)
+    print(f"{len(lentes)} requête(s) lente(s) (>= {STATISTIQUES_REQUETES.seuil_lent_ms:g} ms)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = construire_parseur()
+    args = parser.parse_args(argv)
+    if args.serveur and getattr(args, "sans_serveur", None):
+        # Seuls l'interface graphique et les rapports passent par le serveur ; les autres commandes liraient --db
+        parser.error(f"--serveur ne s'applique pas à la commande {args.commande} : {args.sans_serveur}")
+    if args.chrono:
+        afficher_chrono("imports du module", DEBUT_CHRONO)
+    if args.instrumenter:
+        activer_instrumentation(args.seuil_lent)
+    if args.commande is None:
+        lancer_interface_graphique(args)
+        return 0
+    debut = time.perf_counter()
+    code_retour = args.fonction(args)
+    if args.chrono:
+        afficher_chrono(f"commande {args.commande}", debut)
+    if args.instrumenter:
+        afficher_statistiques_requetes()
+    return code_retour
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file